@@ -0,0 +1,172 @@
+"""Request coalescing and admission control for streaming chats"""
+import asyncio
+import heapq
+import itertools
+import math
+from typing import AsyncIterator, Callable, Dict, Hashable, List, Optional
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"Admission queue full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """Bounded concurrency with a capped, prioritized wait queue.
+
+    ``reserve`` either grants a slot at once, queues the caller (lower
+    ``priority`` values are served first, FIFO within a priority) or raises
+    ``AdmissionRejected`` straight away when the queue is full, with a
+    Retry-After estimate from the recent average hold time.
+    """
+
+    def __init__(self, max_concurrent: int = 16, max_queue: int = 64):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.active = 0
+        self._waiters: List[tuple] = []
+        self._seq = itertools.count()
+        self._avg_hold = 1.0
+        self.admitted = 0
+        self.rejected = 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self._avg_hold * (self.queued + 1) / max(self.max_concurrent, 1)))
+
+    def reserve(self, priority: int = 0) -> "asyncio.Future":
+        """Future that resolves once the caller holds a slot"""
+        slot = asyncio.get_running_loop().create_future()
+        if self.active < self.max_concurrent and not self._waiters:
+            self.active += 1
+            self.admitted += 1
+            slot.set_result(None)
+        elif len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected(self.retry_after())
+        else:
+            waiter = (priority, next(self._seq), slot)
+            heapq.heappush(self._waiters, waiter)
+            slot.add_done_callback(lambda _: self._forget(waiter))
+        return slot
+
+    def _forget(self, waiter: tuple) -> None:
+        """Drop a waiter whose request was cancelled while queued, so it stops counting toward the queue"""
+        if not waiter[2].cancelled():
+            return
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            return
+        heapq.heapify(self._waiters)
+
+    def release(self, held_for: Optional[float] = None) -> None:
+        """Return a slot, handing it straight to the highest-priority live waiter"""
+        if held_for is not None:
+            self._avg_hold = 0.8 * self._avg_hold + 0.2 * held_for
+        while self._waiters:
+            _, _, slot = heapq.heappop(self._waiters)
+            if not slot.done():
+                self.admitted += 1
+                slot.set_result(None)
+                return
+        self.active -= 1
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "avg_hold_seconds": round(self._avg_hold, 3),
+        }
+
+
+class Flight:
+    """One in-flight computation whose events fan out to every subscriber.
+
+    ``context`` is whatever the starter attached for subscribers besides the
+    events, e.g. a log the producer fills in as it runs.
+    """
+
+    def __init__(self, context=None):
+        self.context = context
+        self.events: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self._cond = asyncio.Condition()
+        self.task: Optional[asyncio.Task] = None
+
+    async def publish(self, event: str) -> None:
+        async with self._cond:
+            self.events.append(event)
+            self._cond.notify_all()
+
+    async def finish(self, error: BaseException = None) -> None:
+        async with self._cond:
+            self.done = True
+            self.error = error
+            self._cond.notify_all()
+
+    async def subscribe(self) -> AsyncIterator[str]:
+        """Every event from the start of the flight, then live events until it finishes"""
+        self.subscribers += 1
+        i = 0
+        while True:
+            while i < len(self.events):
+                yield self.events[i]
+                i += 1
+            if self.done:
+                if self.error is not None:
+                    raise self.error
+                return
+            async with self._cond:
+                await self._cond.wait_for(lambda: len(self.events) > i or self.done)
+
+
+class SingleFlight:
+    """Runs at most one producer per key; concurrent callers share its events.
+
+    The producer runs in its own task, so a subscriber disconnecting (even
+    the one that started it) does not cut the stream off for the others.
+    """
+
+    def __init__(self):
+        self._flights: Dict[Hashable, Flight] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    def join(self, key: Hashable) -> Optional[Flight]:
+        flight = self._flights.get(key)
+        if flight is not None:
+            self.coalesced += 1
+        return flight
+
+    def start(self, key: Hashable, producer: Callable[[], AsyncIterator[str]], context=None) -> Flight:
+        flight = Flight(context)
+        self._flights[key] = flight
+        self.started += 1
+        flight.task = asyncio.create_task(self._run(key, flight, producer))
+        return flight
+
+    async def _run(self, key: Hashable, flight: Flight, producer: Callable[[], AsyncIterator[str]]) -> None:
+        error = None
+        try:
+            async for event in producer():
+                await flight.publish(event)
+        except Exception as e:
+            error = e
+        finally:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+            await flight.finish(error)
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._flights), "started": self.started, "coalesced": self.coalesced}
@@ -0,0 +1,2 @@
+"""Offline benchmarks: micro-benchmarks of the search, statistics and ticket
+functions, and an SSE load generator for /chat, all against a stubbed Claude client"""
@@ -0,0 +1,173 @@
+"""End-to-end load generator for the /chat SSE stream.
+
+Without ``--url`` it starts ``bench.serve`` (the API on the Claude stub) in
+a subprocess, so the whole run is offline. Reports time to first byte, time
+to first token and total latency percentiles, plus completed chats per
+second. Run from ``backend/``::
+
+    python -m bench.load --requests 400 --concurrency 32 --script parallel
+    python -m bench.load --url http://localhost:8001 --no-unique
+"""
+import argparse
+import asyncio
+import json
+import socket
+import subprocess
+import sys
+import time
+from itertools import count
+from typing import List, Optional, Tuple
+
+import httpx
+
+from .report import add_arguments, document, finish, print_table, summarize
+from .serve import BACKEND_DIR, add_stub_arguments, stub_argv
+
+MESSAGES = [
+    "My VPN keeps disconnecting when I work from home",
+    "I forgot my password and can't log in to Salesforce",
+    "Outlook stopped syncing email on my phone",
+    "Are there any open P1 incidents for SAP?",
+    "The Oracle database connection pool is exhausted again",
+    "Power BI dashboard refresh keeps failing",
+    "Show me ticket statistics for this week",
+    "What is the status of INC0012847?",
+]
+SERVER_START_TIMEOUT = 600.0
+
+
+async def one_chat(client: httpx.AsyncClient, url: str, payload: dict) -> dict:
+    """Send one chat and time its stream; ``ok`` only if it ends with a ``done`` event"""
+    started = time.perf_counter()
+    result = {"status": None, "ttfb": None, "ttft": None, "latency": None, "ok": False}
+    try:
+        async with client.stream("POST", f"{url}/chat", json=payload) as response:
+            result["status"] = response.status_code
+            if response.status_code != 200:
+                await response.aread()
+                return result
+            buffer = ""
+            async for chunk in response.aiter_text():
+                now = time.perf_counter()
+                if result["ttfb"] is None:
+                    result["ttfb"] = now - started
+                buffer += chunk
+                *events, buffer = buffer.split("\n\n")
+                for event in events:
+                    if not event.startswith("data: "):
+                        continue  # heartbeat comment
+                    kind = json.loads(event[len("data: "):]).get("type")
+                    if kind == "token" and result["ttft"] is None:
+                        result["ttft"] = now - started
+                    elif kind == "done":
+                        result["ok"] = True
+    except (httpx.HTTPError, json.JSONDecodeError) as e:
+        result["error"] = repr(e)
+    result["latency"] = time.perf_counter() - started
+    return result
+
+
+async def run_load(url: str, requests: int, concurrency: int, role: str, unique: bool,
+                   sessions: int, warmup: int, timeout: float) -> dict:
+    numbers = count()
+
+    def payload(i: int) -> dict:
+        message = MESSAGES[i % len(MESSAGES)]
+        body = {"message": f"{message} (ref {i})" if unique else message, "role": role}
+        if sessions:
+            body["session_id"] = f"bench-session-{i % sessions:04d}"
+        return body
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        for i in range(warmup):
+            await one_chat(client, url, payload(-1 - i))
+
+        results: List[dict] = []
+
+        async def worker() -> None:
+            while (i := next(numbers)) < requests:
+                results.append(await one_chat(client, url, payload(i)))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        duration = time.perf_counter() - started
+
+    ok = [r for r in results if r["ok"]]
+    rejected = sum(1 for r in results if r["status"] == 429)
+    return {
+        "requests": len(results),
+        "ok": len(ok),
+        "rejected": rejected,
+        "errors": len(results) - len(ok) - rejected,
+        "duration_s": round(duration, 3),
+        "throughput_rps": round(len(ok) / duration, 2) if duration else 0.0,
+        **summarize([r["ttfb"] for r in ok], "ttfb_"),
+        **summarize([r["ttft"] for r in ok if r["ttft"] is not None], "ttft_"),
+        **summarize([r["latency"] for r in ok], "latency_"),
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args: argparse.Namespace) -> Tuple[subprocess.Popen, str]:
+    port = free_port()
+    proc = subprocess.Popen([sys.executable, "-m", "bench.serve", "--port", str(port), *stub_argv(args)],
+                            cwd=BACKEND_DIR)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + SERVER_START_TIMEOUT
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"bench server exited with code {proc.returncode}")
+        try:
+            if httpx.get(f"{url}/health", timeout=1.0).status_code == 200:
+                return proc, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("bench server did not become healthy in time")
+
+
+def cli() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="target a running server instead of starting a stubbed one")
+    parser.add_argument("--requests", type=int, default=200, help="chats to send (default: %(default)s)")
+    parser.add_argument("--concurrency", type=int, default=16, help="chats in flight (default: %(default)s)")
+    parser.add_argument("--role", choices=("user", "admin"), default="user")
+    parser.add_argument("--unique", action=argparse.BooleanOptionalAction, default=True,
+                        help="make every message distinct so none is served from the chat cache")
+    parser.add_argument("--sessions", type=int, default=0, help="spread chats over this many multi-turn sessions")
+    parser.add_argument("--warmup", type=int, default=4, help="unrecorded chats sent first")
+    parser.add_argument("--timeout", type=float, default=120.0, help="per-chat timeout in seconds")
+    add_stub_arguments(parser)
+    add_arguments(parser, "load")
+    args = parser.parse_args()
+
+    proc: Optional[subprocess.Popen] = None
+    url = args.url
+    if not url:
+        proc, url = start_server(args)
+    try:
+        results = asyncio.run(run_load(url.rstrip("/"), args.requests, args.concurrency, args.role,
+                                       args.unique, args.sessions, args.warmup, args.timeout))
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait()
+
+    print_table({"chat": results}, ("ok", "throughput_rps", "ttfb_p50_ms", "ttfb_p99_ms",
+                                    "latency_p50_ms", "latency_p99_ms"))
+    config = {key: value for key, value in vars(args).items()
+              if key not in ("out", "baseline", "update_baseline", "tolerance")}
+    if args.url:
+        config.update(dict.fromkeys(("ttft", "tokens_per_second", "answer_tokens", "script", "tickets")))
+    return finish(args, document("load", config, {"chat": results}))
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
@@ -0,0 +1,193 @@
+"""Micro-benchmarks of the search, statistics and ticket-creation functions
+at several corpus sizes, with the Claude client stubbed out.
+
+Each size runs in a fresh interpreter so indexes start from a clean import
+and one size's memory doesn't skew the next. Run from ``backend/``::
+
+    python -m bench.micro                                # 1k, 100k and 1M tickets
+    python -m bench.micro --sizes 1000,100000 --update-baseline
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+from .report import add_arguments, calibrate, document, finish, percentile, print_table, summarize
+from .stub_client import StubAnthropic
+from .synthetic import populate
+
+DEFAULT_SIZES = "1000,100000,1000000"
+WARMUP_ITERATIONS = 3
+REFERENCE_SAMPLES = 8
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+TICKET_QUERIES = [
+    ("SAP integration failing for warehouse module", None, None),
+    ("Salesforce authentication timeout", "Open", None),
+    ("Oracle DB connection pool exhausted", None, "P1"),
+    ("certificate expired after upgrade", None, None),
+]
+# Contain a broad keyword, so unscored tickets are listed too
+BROAD_QUERIES = [
+    ("show all open tickets", "Open", None),
+    ("list my P1 incidents", None, "P1"),
+]
+KB_QUERIES = [
+    "how do I reset my password",
+    "VPN keeps disconnecting when working from home",
+    "outlook email not syncing on my phone",
+    "database connection pool tuning",
+]
+DUPLICATE_TEXTS = [
+    "Okta SSO authentication timeout for remote users",
+    "Printer disk full since this morning, nobody can print",
+]
+
+
+def label(n: int) -> str:
+    if n >= 1_000_000 and n % 1_000_000 == 0:
+        return f"{n // 1_000_000}M"
+    if n >= 1000 and n % 1000 == 0:
+        return f"{n // 1000}k"
+    return str(n)
+
+
+def operations(main) -> dict:
+    """Read-only benchmarks: name -> function of the iteration number"""
+    return {
+        "search_tickets": lambda i: main.search_tickets_fn(*TICKET_QUERIES[i % len(TICKET_QUERIES)]),
+        "search_tickets_broad": lambda i: main.search_tickets_fn(*BROAD_QUERIES[i % len(BROAD_QUERIES)]),
+        "search_kb": lambda i: main.search_kb_fn(KB_QUERIES[i % len(KB_QUERIES)]),
+        "get_ticket_stats": lambda i: main.get_ticket_stats_fn(),
+        "find_duplicates": lambda i: main.find_duplicates(DUPLICATE_TEXTS[i % len(DUPLICATE_TEXTS)]),
+    }
+
+
+def create_operation(main):
+    requests = [
+        main.TicketCreateRequest(subject=f"{subject} (bench)", description=f"Reported during benchmark: {subject}.",
+                                 priority=priority or "P3", requester_email="bench@company.com")
+        for subject, _, priority in TICKET_QUERIES + BROAD_QUERIES
+    ]
+    loop = asyncio.new_event_loop()
+    return lambda i: loop.run_until_complete(main.create_ticket(requests[i % len(requests)]))
+
+
+def sample(fn, seconds: float, min_iterations: int = 5, max_iterations: int = 100_000) -> List[float]:
+    samples = []
+    deadline = time.perf_counter() + seconds
+    while len(samples) < max_iterations and (len(samples) < min_iterations or time.perf_counter() < deadline):
+        started = time.perf_counter()
+        fn(len(samples))
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def summary(samples: List[float]) -> dict:
+    total = sum(samples)
+    return {**summarize(samples), "ops_per_sec": round(len(samples) / total, 1) if total else 0.0,
+            "iterations": len(samples)}
+
+
+def run_worker(n: int, seconds: float, rounds: int, backend: str) -> dict:
+    """Benchmark one corpus size in this process; main is imported here, after the environment is set.
+
+    The read-only benchmarks take turns over several rounds, and each
+    benchmark's slices are paired with reference measurements taken just
+    before them, so a change in host speed affects both alike.
+    Ticket creation grows the corpus, so its rounds come last and add at
+    most ``n // 10`` tickets (at least 100).
+    """
+    data_dir = tempfile.mkdtemp(prefix="bench-")
+    os.environ.setdefault("ANTHROPIC_API_KEY", "bench-stub")
+    os.environ.update({"STORAGE_BACKEND": backend, "SQLITE_PATH": os.path.join(data_dir, "bench.db"),
+                       "VECTOR_INDEX_PATH": "", "STORE_SYNC_INTERVAL": "0"})
+    try:
+        sys.path.insert(0, BACKEND_DIR)
+        import main
+        main.client = StubAnthropic()
+
+        print(f"[{label(n)}] loading {n} tickets", file=sys.stderr, flush=True)
+        references: Dict[str, List[float]] = {"populate": [calibrate()]}
+        loaded = populate(main, n)
+        references["populate"].append(calibrate())
+
+        ops = operations(main)
+        for name, fn in ops.items():
+            for i in range(WARMUP_ITERATIONS):
+                fn(i)
+        samples: Dict[str, List[float]] = {name: [] for name in ops}
+        for r in range(rounds):
+            print(f"[{label(n)}] round {r + 1}/{rounds}", file=sys.stderr, flush=True)
+            for name, fn in ops.items():
+                references.setdefault(name, []).append(calibrate(REFERENCE_SAMPLES))
+                samples[name].extend(sample(fn, seconds / rounds))
+        create = create_operation(main)
+        creates = max(100, n // 10) // rounds
+        samples["create_ticket"] = []
+        for r in range(rounds):
+            print(f"[{label(n)}] create_ticket {r + 1}/{rounds}", file=sys.stderr, flush=True)
+            references.setdefault("create_ticket", []).append(calibrate(REFERENCE_SAMPLES))
+            samples["create_ticket"].extend(sample(create, seconds / rounds, max_iterations=creates))
+        main.TICKET_STORE.close()
+
+        peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        return {
+            "populate": {**loaded, "peak_rss_mb": round(peak_rss_mb, 1)},
+            "operations": {name: summary(values) for name, values in samples.items()},
+            "reference_ms": {name: round(percentile(sorted(values), 0.5), 4) for name, values in references.items()},
+        }
+    finally:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+
+def cli() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="comma-separated ticket counts (default: %(default)s)")
+    parser.add_argument("--seconds", type=float, default=1.0, help="time budget per benchmark (default: %(default)s)")
+    parser.add_argument("--rounds", type=int, default=5, help="interleaved rounds per benchmark (default: %(default)s)")
+    parser.add_argument("--backend", choices=("memory", "sqlite"), default="memory")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    add_arguments(parser, "micro")
+    args = parser.parse_args()
+
+    if args.worker is not None:
+        json.dump(run_worker(args.worker, args.seconds, args.rounds, args.backend), sys.stdout)
+        return 0
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    results, calibration, failed = {}, {}, []
+    for n in sizes:
+        proc = subprocess.run(
+            [sys.executable, "-m", "bench.micro", "--worker", str(n), "--seconds", str(args.seconds),
+             "--rounds", str(args.rounds), "--backend", args.backend],
+            cwd=BACKEND_DIR, stdout=subprocess.PIPE, text=True,
+        )
+        if proc.returncode != 0:
+            print(f"[{label(n)}] failed with exit code {proc.returncode}", file=sys.stderr)
+            failed.append(n)
+            continue
+        run = json.loads(proc.stdout)
+        results[f"populate@{label(n)}"] = run["populate"]
+        for name, metrics in run["operations"].items():
+            results[f"{name}@{label(n)}"] = metrics
+        calibration.update({f"{name}@{label(n)}": ms for name, ms in run["reference_ms"].items()})
+
+    print_table(results, ("p50_ms", "p99_ms", "ops_per_sec", "import_rows_per_sec", "peak_rss_mb"))
+    if failed:
+        print(f"sizes failed: {', '.join(map(label, failed))}; not saving or comparing", file=sys.stderr)
+        return 1
+    config = {"sizes": sizes, "seconds": args.seconds, "rounds": args.rounds, "backend": args.backend}
+    doc = document("micro", config, results, calibration)
+    return finish(args, doc)
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
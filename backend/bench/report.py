@@ -0,0 +1,191 @@
+"""Latency summaries, JSON baselines and regression checks shared by the benchmarks"""
+import argparse
+import json
+import os
+import time
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from typing import Dict, List, Sequence, Tuple
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+DEFAULT_TOLERANCE = 0.25
+# Differences below this are timer noise, whatever the ratio
+NOISE_FLOOR_MS = 0.05
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """Linearly interpolated ``q``-quantile (0..1) of already sorted values"""
+    if not sorted_values:
+        return 0.0
+    pos = (len(sorted_values) - 1) * q
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+def summarize(seconds: Sequence[float], prefix: str = "") -> Dict[str, float]:
+    """p50/p90/p99/mean/max in milliseconds, keys optionally prefixed (``ttfb_p50_ms``)"""
+    values = sorted(seconds)
+    mean = sum(values) / len(values) if values else 0.0
+    stats = {"p50": percentile(values, 0.5), "p90": percentile(values, 0.9), "p99": percentile(values, 0.99),
+             "mean": mean, "max": values[-1] if values else 0.0}
+    return {f"{prefix}{name}_ms": round(value * 1000, 3) for name, value in stats.items()}
+
+
+def reference_workload() -> None:
+    """Fixed pure-Python work (dicts, JSON, sorting) that tracks the interpreter's speed"""
+    counts = {}
+    for i in range(2000):
+        key = f"key{i % 97}"
+        counts[key] = counts.get(key, 0) + len(json.dumps([i, key]))
+    sorted(counts.items(), key=lambda item: -item[1])
+
+
+def calibrate(samples: int = 20) -> float:
+    """Median milliseconds of the reference workload right now.
+
+    Shared and throttled hosts change speed from one minute to the next;
+    recording this alongside CPU-bound results lets ``compare`` tell a
+    slower machine from slower code.
+    """
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        reference_workload()
+        timings.append(time.perf_counter() - started)
+    return round(percentile(sorted(timings), 0.5) * 1000, 4)
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        commit = ""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "commit": commit or None,
+    }
+
+
+def document(suite: str, config: dict, results: Dict[str, dict], calibration: Dict[str, float] = None) -> dict:
+    """A run as saved to disk; ``calibration`` maps result groups to the reference time measured with them"""
+    doc = {
+        "suite": suite,
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": environment(),
+        "config": config,
+        "results": results,
+    }
+    if calibration:
+        doc["calibration"] = calibration
+    return doc
+
+
+def write_json(path: str, doc: dict) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(doc, f, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp, path)
+
+
+def _direction(metric: str) -> int:
+    """+1 when higher is better, -1 when lower is better, 0 for informational metrics.
+
+    Maxima are single samples and means follow them (rates already track
+    the mean), so neither is gated.
+    """
+    if metric.endswith(("max_ms", "mean_ms")):
+        return 0
+    if metric.endswith("_ms"):
+        return -1
+    if metric.endswith(("_per_sec", "_rps")):
+        return 1
+    return 0
+
+
+def compare(current: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE) -> List[Tuple]:
+    """``(group, metric, baseline, current, change, regressed)`` for every shared directional metric.
+
+    A latency regresses when it grows by more than ``tolerance`` (and by more
+    than the noise floor), a rate when it drops by more than ``tolerance``.
+    Tail percentiles get twice the tolerance, since they rest on few samples.
+    When both runs calibrated a group, its baseline is first scaled by the
+    ratio of their reference times, so host speed drift cancels out.
+    """
+    rows = []
+    for group, metrics in current["results"].items():
+        base_metrics = baseline["results"].get(group, {})
+        base_reference = baseline.get("calibration", {}).get(group)
+        reference = current.get("calibration", {}).get(group)
+        speed = reference / base_reference if reference and base_reference else 1.0
+        for metric, value in metrics.items():
+            direction = _direction(metric)
+            base = base_metrics.get(metric)
+            if not direction or not isinstance(base, (int, float)) or not isinstance(value, (int, float)):
+                continue
+            base = round(base * speed if direction < 0 else base / speed, 3)
+            allowed = tolerance * 2 if "p99" in metric else tolerance
+            change = (value - base) / base if base else 0.0
+            if direction < 0:
+                regressed = change > allowed and value - base > NOISE_FLOOR_MS
+            else:
+                regressed = change < -allowed
+            rows.append((group, metric, base, value, change, regressed))
+    return rows
+
+
+def print_table(results: Dict[str, dict], columns: Sequence[str], out=sys.stdout) -> None:
+    names = list(results)
+    width = max([len("group")] + [len(name) for name in names])
+    out.write("  ".join([f"{'group':<{width}}"] + [f"{column:>14}" for column in columns]) + "\n")
+    for name in names:
+        cells = [results[name].get(column, "") for column in columns]
+        out.write("  ".join([f"{name:<{width}}"] + [f"{cell:>14}" for cell in cells]) + "\n")
+
+
+def add_arguments(parser: argparse.ArgumentParser, suite: str) -> None:
+    parser.add_argument("--out", help="also write this run's results to a JSON file")
+    parser.add_argument("--baseline", default=os.path.join(BASELINE_DIR, f"{suite}.json"),
+                        help="baseline JSON to compare against (default: %(default)s)")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="overwrite the baseline with this run instead of comparing")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed relative slowdown before a metric counts as a regression")
+
+
+def finish(args: argparse.Namespace, doc: dict) -> int:
+    """Save and/or compare a run per the command line; the process exit code"""
+    if args.out:
+        write_json(args.out, doc)
+    if args.update_baseline:
+        write_json(args.baseline, doc)
+        print(f"baseline written to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}; run with --update-baseline to create one")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("environment", {}).get("machine") != doc["environment"]["machine"] or \
+            baseline.get("environment", {}).get("cpus") != doc["environment"]["cpus"]:
+        print("note: baseline was recorded on different hardware; expect drift")
+    changed = sorted(key for key, value in doc["config"].items() if baseline.get("config", {}).get(key, value) != value)
+    if changed:
+        print(f"note: configuration differs from the baseline ({', '.join(changed)})")
+    if doc.get("calibration") and baseline.get("calibration"):
+        print("note: baselines are scaled by the change in reference time, i.e. host speed")
+    rows = compare(doc, baseline, args.tolerance)
+    regressions = [row for row in rows if row[5]]
+    for group, metric, base, value, change, regressed in rows:
+        flag = "REGRESSION" if regressed else ""
+        print(f"{group:<28} {metric:<22} {base:>12} -> {value:<12} {change:+7.1%} {flag}")
+    print(f"{len(regressions)} regression(s) in {len(rows)} metrics (tolerance {args.tolerance:.0%})")
+    return 1 if regressions else 0
@@ -0,0 +1,103 @@
+"""Check the pruned ``InvertedIndex.top`` against brute-force ``scores()``.
+
+Builds a ticket index from synthetic data, churns it (re-indexed subjects,
+status changes, removals) so the cached upper bounds go stale the way they
+do in service, then compares random queries, with and without facet
+filters and priority ordering. Run from ``backend/``::
+
+    python -m bench.search_check                      # 20k tickets, 1500 queries
+    python -m bench.search_check --docs 100000 --queries 500
+
+Exits non-zero on the first few mismatches.
+"""
+import argparse
+import heapq
+import random
+import sys
+import time
+
+from search import InvertedIndex
+
+from .synthetic import QUALIFIERS, STATUSES, SYMPTOMS, SYSTEMS, iter_tickets
+
+TOLERANCE = 1e-9
+MAX_REPORTED = 5
+
+
+def build(n: int, rng: random.Random) -> InvertedIndex:
+    index = InvertedIndex({"subject": 1.0, "category": 1.0}, facets=("status", "priority"))
+    tickets = list(iter_tickets(n))
+    index.add_many(tickets)
+    for ticket in rng.sample(tickets, n // 10):
+        changed = {**ticket, "status": rng.choice([status for status, _ in STATUSES])}
+        if rng.random() < 0.5:
+            changed["subject"] = f"{rng.choice(list(SYSTEMS))} {rng.choice(SYMPTOMS)}"
+        index.update(changed)
+    for ticket in rng.sample(tickets, n // 50):
+        index.remove(ticket["id"])
+    return index
+
+
+def brute_force(index: InvertedIndex, query: str, k: int, within: list, order_by: str = None):
+    ranks = {value: i for i, value in enumerate(sorted(index.facets[order_by]))} if order_by else {}
+    scored = [(doc_id, score) for doc_id, score in index.scores(query).items()
+              if all(doc_id in s for s in within)]
+    rank = (lambda doc_id: ranks[index.doc_facets[doc_id][order_by]]) if order_by else (lambda doc_id: 0)
+    best = max((score for _, score in scored), default=0.0)
+    return heapq.nsmallest(k, scored, key=lambda hit: (rank(hit[0]), -hit[1])), best, rank
+
+
+def random_case(index: InvertedIndex, rng: random.Random, words: list):
+    query = " ".join(rng.sample(words, rng.randint(1, 6)))
+    within = []
+    status = rng.choice([None, None, "open", "resolved", "escalated"])
+    priority = rng.choice([None, None, "p1", "p3"])
+    if status:
+        within.append(index.facet("status", status))
+    if priority:
+        within.append(index.facet("priority", priority))
+    order_by = None if priority else rng.choice([None, "priority"])
+    return query, rng.choice([1, 5, 20]), within, order_by
+
+
+def check(index: InvertedIndex, query: str, k: int, within: list, order_by: str = None) -> str:
+    """Empty when ``top`` agrees with brute force, else what differs"""
+    hits, best = index.top(query, k, within, order_by=order_by)
+    expected, expected_best, rank = brute_force(index, query, k, within, order_by)
+    if abs(best - expected_best) > TOLERANCE:
+        return f"best score {best} != {expected_best}"
+    # Equal scores may tie-break differently, so compare (rank, score) sequences
+    got = [(rank(doc_id), score) for doc_id, score in hits]
+    want = [(rank(doc_id), score) for doc_id, score in expected]
+    if len(got) != len(want) or any(a[0] != b[0] or abs(a[1] - b[1]) > TOLERANCE for a, b in zip(got, want)):
+        return f"top {got} != {want}"
+    return ""
+
+
+def cli() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=1500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    index = build(args.docs, rng)
+    words = " ".join(list(SYSTEMS) + SYMPTOMS + QUALIFIERS).split() + ["zzz", "not", "network"]
+    started = time.perf_counter()
+    failures = 0
+    for _ in range(args.queries):
+        query, k, within, order_by = random_case(index, rng, words)
+        problem = check(index, query, k, within, order_by)
+        if problem:
+            failures += 1
+            if failures <= MAX_REPORTED:
+                print(f"{query!r} k={k} filters={len(within)} order_by={order_by}: {problem}", file=sys.stderr)
+    elapsed = time.perf_counter() - started
+    print(f"{args.queries - failures}/{args.queries} queries match brute force "
+          f"({args.docs} docs, {elapsed:.1f}s)")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(cli())
@@ -0,0 +1,55 @@
+"""The API with Claude replaced by the deterministic stub, for load tests.
+
+Run from ``backend/``; service settings (CHAT_MAX_CONCURRENCY, SSE_FLUSH_MS,
+...) are read from the environment as usual::
+
+    python -m bench.serve --port 8765 --ttft 0.3 --script parallel --tickets 100000
+"""
+import argparse
+import os
+import sys
+
+from .stub_client import SCRIPTS, StubAnthropic, load_script
+from .synthetic import populate
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--ttft", type=float, default=0.3, help="seconds before each model call responds")
+    parser.add_argument("--tokens-per-second", type=float, default=80.0, help="answer streaming rate")
+    parser.add_argument("--answer-tokens", type=int, default=60, help="words in each answer")
+    parser.add_argument("--script", default="search",
+                        help=f"tool-use script: {', '.join(SCRIPTS)} or a JSON file (default: %(default)s)")
+    parser.add_argument("--tickets", type=int, default=0, help="synthetic tickets to load before serving")
+
+
+def stub_argv(args: argparse.Namespace) -> list:
+    return ["--ttft", str(args.ttft), "--tokens-per-second", str(args.tokens_per_second),
+            "--answer-tokens", str(args.answer_tokens), "--script", args.script, "--tickets", str(args.tickets)]
+
+
+def build_app(args: argparse.Namespace):
+    os.environ.setdefault("ANTHROPIC_API_KEY", "bench-stub")
+    sys.path.insert(0, BACKEND_DIR)
+    import main
+    main.client = StubAnthropic(load_script(args.script), ttft=args.ttft,
+                                tokens_per_second=args.tokens_per_second, answer_tokens=args.answer_tokens)
+    if args.tickets:
+        populate(main, args.tickets)
+    return main.app
+
+
+def cli() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(build_app(args), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    cli()
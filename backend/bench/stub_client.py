@@ -0,0 +1,169 @@
+"""Deterministic stand-in for ``anthropic.AsyncAnthropic`` with modelled latency"""
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+from typing import Dict, List
+
+CHARS_PER_TOKEN = 4
+
+# Each script is the model's turns for one chat: tool turns, then the answer.
+# "{message}" in a tool input is replaced by the user's message.
+SCRIPTS: Dict[str, List[dict]] = {
+    "answer": [{"text": True}],
+    "search": [
+        {"tools": [{"name": "search_tickets", "input": {"query": "{message}"}}]},
+        {"text": True},
+    ],
+    "parallel": [
+        {"tools": [{"name": "search_tickets", "input": {"query": "{message}"}},
+                   {"name": "search_knowledge_base", "input": {"query": "{message}"}}]},
+        {"text": True},
+    ],
+    "chain": [
+        {"tools": [{"name": "search_knowledge_base", "input": {"query": "{message}"}}]},
+        {"tools": [{"name": "get_ticket_statistics", "input": {}}]},
+        {"text": True},
+    ],
+}
+
+ANSWER_WORDS = (
+    "I checked the service desk and found the relevant tickets and articles. The most likely fix is "
+    "to verify the connection settings, confirm your credentials are current, and retry the failing "
+    "step. If the problem persists after that, I can escalate it to the on-call engineer for you."
+).split()
+
+
+def load_script(name_or_path: str) -> List[dict]:
+    """A named script from ``SCRIPTS`` or a JSON file holding a list of turns"""
+    if name_or_path in SCRIPTS:
+        return SCRIPTS[name_or_path]
+    with open(name_or_path) as f:
+        return json.load(f)
+
+
+def _fill(value, message: str):
+    if isinstance(value, str):
+        return value.replace("{message}", message)
+    if isinstance(value, dict):
+        return {k: _fill(v, message) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_fill(v, message) for v in value]
+    return value
+
+
+def _text(content) -> str:
+    if isinstance(content, str):
+        return content
+    return " ".join(block.get("text", "") for block in content if isinstance(block, dict))
+
+
+class _Stream:
+    def __init__(self, client: "StubAnthropic", request: dict):
+        self.client = client
+        self.request = request
+        self.turn, self.message = client.next_turn(request["messages"])
+        self.tokens = client.answer_tokens if self.turn.get("text") else 0
+        self._text = ""
+        self._started = False
+
+    async def __aenter__(self) -> "_Stream":
+        return self
+
+    async def __aexit__(self, *exc) -> bool:
+        return False
+
+    @property
+    def text_stream(self):
+        return self._emit()
+
+    async def _emit(self):
+        self._started = True
+        started = time.monotonic()
+        await asyncio.sleep(self.client.ttft)
+        words = self.client.words
+        for i in range(self.tokens):
+            if i and self.client.tokens_per_second > 0:
+                # Sleep to a schedule rather than a fixed delay, so timer overshoot doesn't accumulate
+                delay = started + self.client.ttft + i / self.client.tokens_per_second - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            piece = (" " if i else "") + words[i % len(words)]
+            self._text += piece
+            yield piece
+
+    async def get_final_message(self):
+        if not self._started:
+            await asyncio.sleep(self.client.ttft)
+        content = []
+        if self._text:
+            content.append(SimpleNamespace(type="text", text=self._text))
+        for i, call in enumerate(self.turn.get("tools", ())):
+            content.append(SimpleNamespace(type="tool_use", id=f"toolu_stub_{i}", name=call["name"],
+                                           input=_fill(call.get("input", {}), self.message)))
+        return SimpleNamespace(
+            content=content,
+            stop_reason="tool_use" if self.turn.get("tools") else "end_turn",
+            usage=self.client.usage(self.request, self.tokens or 20),
+        )
+
+
+class _Messages:
+    def __init__(self, client: "StubAnthropic"):
+        self.client = client
+
+    def stream(self, **request) -> _Stream:
+        self.client.calls += 1
+        return _Stream(self.client, request)
+
+
+class StubAnthropic:
+    """Plays a tool-use script instead of calling the API.
+
+    Every call waits ``ttft`` seconds before its first token (or, for a tool
+    turn, before returning), then streams ``answer_tokens`` words at
+    ``tokens_per_second``. The turn played is chosen from the conversation
+    itself, counting the tool rounds since the last user message, so the
+    stub holds no per-chat state and concurrent chats stay independent.
+    Usage is estimated from request size, with the tools and system prefix
+    reported as prompt-cache reads after the first call.
+    """
+
+    def __init__(self, script: List[dict] = None, ttft: float = 0.3, tokens_per_second: float = 80.0,
+                 answer_tokens: int = 60):
+        self.script = script or SCRIPTS["search"]
+        self.ttft = ttft
+        self.tokens_per_second = tokens_per_second
+        self.answer_tokens = answer_tokens
+        self.words = ANSWER_WORDS
+        self.messages = _Messages(self)
+        self.calls = 0
+        self._prefix_tokens: Dict[tuple, int] = {}
+
+    def next_turn(self, messages: List[dict]):
+        rounds = 0
+        message = ""
+        for entry in reversed(messages):
+            if entry["role"] == "user" and (isinstance(entry["content"], str) or not any(
+                    isinstance(block, dict) and block.get("type") == "tool_result" for block in entry["content"])):
+                message = _text(entry["content"])
+                break
+            if entry["role"] == "assistant":
+                rounds += 1
+        turn = self.script[min(rounds, len(self.script) - 1)]
+        return turn, message
+
+    def usage(self, request: dict, output_tokens: int) -> SimpleNamespace:
+        # The scaffold objects are built once per role, so their identity keys the prefix
+        key = (id(request.get("tools")), id(request.get("system")))
+        cached = key in self._prefix_tokens
+        if not cached:
+            prefix = json.dumps([request.get("tools"), request.get("system")], default=str)
+            self._prefix_tokens[key] = len(prefix) // CHARS_PER_TOKEN
+        prefix_tokens = self._prefix_tokens[key]
+        return SimpleNamespace(
+            input_tokens=len(json.dumps(request["messages"], default=str)) // CHARS_PER_TOKEN,
+            output_tokens=output_tokens,
+            cache_read_input_tokens=prefix_tokens if cached else 0,
+            cache_creation_input_tokens=0 if cached else prefix_tokens,
+        )
@@ -0,0 +1,97 @@
+"""Reproducible synthetic tickets shaped like the seed data"""
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Iterator, List
+
+SYSTEMS = {
+    "SAP": "Infrastructure", "Salesforce": "Access", "Outlook": "Email", "VPN": "Network",
+    "Oracle DB": "Database", "Power BI": "Analytics", "Azure ML endpoint": "ML/AI", "EDI 850 feed": "Data Integration",
+    "Jira": "Applications", "Workday": "HR Systems", "Teams": "Collaboration", "SharePoint": "Collaboration",
+    "Okta SSO": "Access", "Kubernetes cluster": "Infrastructure", "Printer": "Hardware", "Laptop": "Hardware",
+}
+SYMPTOMS = [
+    "integration failing", "authentication timeout", "not syncing", "connection pool exhausted",
+    "refresh failure", "latency exceeded SLA", "access denied", "crashes on startup", "slow performance",
+    "certificate expired", "license expired", "disk full", "password reset not working", "error 500 on save",
+]
+QUALIFIERS = ["", "", "for warehouse module", "in EMEA region", "after upgrade", "for remote users",
+              "since this morning", "for finance team"]
+ASSIGNEES = ["Chen, Michael", "Rodriguez, Ana", "Patel, Raj", "Thompson, Sarah", "Kim, David", "Garcia, Maria",
+             "Unassigned"]
+PRIORITIES = (("P1", 0.1), ("P2", 0.3), ("P3", 0.6))
+STATUSES = (("Open", 0.3), ("In Progress", 0.25), ("Resolved", 0.4), ("Escalated", 0.05))
+RESOLUTIONS = ["Restarted the service and verified recovery.", "Renewed the certificate and redeployed.",
+               "Reset credentials and re-enrolled MFA.", "Increased pool size and recycled connections."]
+START = datetime(2024, 1, 1)
+SPAN_HOURS = 2 * 365 * 24
+
+# Clear of the seven-digit IDs the service assigns
+ID_OFFSET = 20_000_000
+
+
+def _weighted(rng: random.Random, choices) -> str:
+    return rng.choices([value for value, _ in choices], weights=[weight for _, weight in choices])[0]
+
+
+def iter_tickets(n: int, seed: int = 0) -> Iterator[dict]:
+    rng = random.Random(seed)
+    for i in range(n):
+        system = rng.choice(list(SYSTEMS))
+        symptom = rng.choice(SYMPTOMS)
+        subject = " ".join(filter(None, [system, symptom, rng.choice(QUALIFIERS)]))
+        created = START + timedelta(hours=rng.randrange(SPAN_HOURS))
+        status = _weighted(rng, STATUSES)
+        ticket = {
+            "id": f"INC{ID_OFFSET + i}",
+            "subject": subject,
+            "priority": _weighted(rng, PRIORITIES),
+            "status": status,
+            "assigned": rng.choice(ASSIGNEES),
+            "created": created.strftime("%Y-%m-%d"),
+            "created_at": created.isoformat(timespec="seconds"),
+            "category": SYSTEMS[system],
+            "updated": "1 day ago",
+            "requester": f"user{rng.randrange(5000)}@company.com",
+            "resolution": None,
+            "description": f"Users report {system} {symptom}. Impact: {rng.randrange(1, 500)} users.",
+        }
+        if status == "Resolved":
+            ticket["resolution"] = rng.choice(RESOLUTIONS)
+            ticket["resolved_at"] = (created + timedelta(minutes=rng.randrange(10, 72 * 60))).isoformat(timespec="seconds")
+        yield ticket
+
+
+def batches(n: int, size: int = 10_000, seed: int = 0) -> Iterator[List[dict]]:
+    batch: List[dict] = []
+    for ticket in iter_tickets(n, seed):
+        batch.append(ticket)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def populate(main, n: int, seed: int = 0) -> dict:
+    """Load ``n`` synthetic tickets into a freshly imported ``main`` module.
+
+    Tickets go through ``add_tickets`` like a bulk import; the ticket vectors
+    are then rebuilt as a restarted worker would, so IDF weights reflect the
+    whole corpus rather than the six seed tickets. Each batch is durable
+    before the next is written. Returns both timings.
+    """
+    importing = 0.0  # excludes the time spent generating tickets
+    for batch in batches(n, seed=seed):
+        started = time.perf_counter()
+        asyncio.run(main.add_tickets(batch))
+        importing += time.perf_counter() - started
+    # Free the incrementally built matrix before building its replacement
+    main.TICKET_VECTORS = main.VectorIndex(main.VECTOR_DIM)
+    started = time.perf_counter()
+    main.TICKET_VECTORS = main.load_ticket_vectors()
+    return {
+        "import_rows_per_sec": round(n / importing, 1) if importing else 0.0,
+        "vector_rebuild_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
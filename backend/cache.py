@@ -0,0 +1,120 @@
+"""Bounded TTL/LRU cache with tag-based invalidation"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Iterable, Set
+
+MISSING = object()
+# Invalidation counters are kept per hash slot rather than per tag, so memory stays
+# bounded however many ticket tags there are; a collision only skips a cache write
+GENERATION_SLOTS = 4096
+
+
+class TTLCache:
+    """LRU cache whose entries also expire after ``ttl`` seconds.
+
+    Each entry is stored with the tags of the data it was derived from;
+    ``invalidate(tags)`` drops exactly the entries carrying any of those tags,
+    so writers can evict what they changed without flushing everything.
+
+    A value computed from data read before an invalidation must not be stored
+    after it. Callers take ``generations(tags)`` before reading and pass it to
+    ``set``, which drops the value if any of those tags was invalidated since.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 60.0, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._by_tag: Dict[str, Set[Hashable]] = {}
+        self._lock = threading.Lock()
+        self._generations = [0] * GENERATION_SLOTS
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.stale_writes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _drop(self, key: Hashable) -> None:
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_tag[tag]
+
+    def get(self, key: Hashable):
+        """Cached value, or ``MISSING``"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+            if entry[0] <= self.clock():
+                self._drop(key)
+                self.expirations += 1
+                self.misses += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def generations(self, tags: Iterable[str]) -> Dict[str, int]:
+        """Current invalidation counters of ``tags``, to hand to ``set`` later"""
+        counters = self._generations
+        return {tag: counters[hash(tag) % GENERATION_SLOTS] for tag in tags}
+
+    def set(self, key: Hashable, value, tags: Iterable[str] = (), generations: Dict[str, int] = None) -> None:
+        """Store a value; skipped if any tag in ``generations`` was invalidated since it was taken"""
+        if self.max_entries <= 0 or self.ttl <= 0:
+            return
+        tags = frozenset(tags)
+        with self._lock:
+            if generations and any(self._generations[hash(tag) % GENERATION_SLOTS] != generation
+                                   for tag, generation in generations.items()):
+                self.stale_writes += 1
+                return
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (self.clock() + self.ttl, value, tags)
+            for tag in tags:
+                self._by_tag.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, tags: Iterable[str]) -> int:
+        """Drop every entry tagged with any of ``tags``; returns how many were dropped"""
+        with self._lock:
+            keys = set()
+            for tag in tags:
+                self._generations[hash(tag) % GENERATION_SLOTS] += 1
+                keys.update(self._by_tag.get(tag, ()))
+            for key in keys:
+                self._drop(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_tag.clear()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "stale_writes": self.stale_writes,
+        }
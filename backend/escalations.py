@@ -0,0 +1,202 @@
+"""SLA-ordered escalation queue: binary heaps with lazy deletion"""
+import heapq
+import itertools
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+PRIORITY_RANK = {"P1": 0, "P2": 1, "P3": 2}
+
+
+class _Entry:
+    __slots__ = ("escalation", "rank", "due", "seq", "assignee", "breached")
+
+    def __init__(self, escalation: dict, due: float, seq: int):
+        self.escalation = escalation
+        self.rank = PRIORITY_RANK.get(escalation.get("priority"), len(PRIORITY_RANK))
+        self.due = due
+        self.seq = seq
+        self.assignee = escalation.get("assigned_to")
+        self.breached = bool(escalation.get("sla_breached"))
+
+
+class EscalationQueue:
+    """Open escalations ordered by ticket priority, then SLA deadline.
+
+    Three binary heaps index the same entries: every open escalation by
+    ``(priority, due)`` for the admin view, the unassigned ones in the same
+    order for auto-assignment, and the ones not yet breached by ``due`` for
+    breach detection. Pushes and pops are O(log n). Removing an escalation
+    only drops its entry; its heap items go stale and are discarded when
+    they surface, and the heaps are rebuilt once stale items outnumber live
+    ones, so removal is O(log n) amortized too.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, _Entry] = {}
+        self._by_ticket: Dict[str, Set[str]] = {}
+        # (rank, due, seq, id) / (rank, due, seq, id) / (due, seq, id)
+        self._open: List[tuple] = []
+        self._unassigned: List[tuple] = []
+        self._deadlines: List[tuple] = []
+        self._seq = itertools.count()
+        # Open escalations per assignee, for least-loaded assignment
+        self.loads: Counter = Counter()
+        # Bumped whenever the order of the open heap may change; ``top`` restarts on it
+        self.version = 0
+        self.unassigned = 0
+        self.breached_open = 0
+        self.assigned_total = 0
+        self.breached_total = 0
+        self.removed_total = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, escalation_id: str) -> bool:
+        return escalation_id in self._entries
+
+    def get(self, escalation_id: str) -> Optional[dict]:
+        entry = self._entries.get(escalation_id)
+        return None if entry is None else entry.escalation
+
+    def push(self, escalation: dict, due: float) -> None:
+        """Queue an open escalation whose SLA deadline is ``due`` (a timestamp)"""
+        if escalation["id"] in self._entries:
+            self.remove(escalation["id"])
+        entry = _Entry(escalation, due, next(self._seq))
+        self._entries[escalation["id"]] = entry
+        self._by_ticket.setdefault(escalation["ticket_id"], set()).add(escalation["id"])
+        self._index(entry)
+        if entry.assignee:
+            self.loads[entry.assignee] += 1
+        else:
+            self.unassigned += 1
+        self.breached_open += entry.breached
+        self.version += 1
+
+    def _index(self, entry: _Entry) -> None:
+        item = (entry.rank, entry.due, entry.seq, entry.escalation["id"])
+        heapq.heappush(self._open, item)
+        if not entry.assignee:
+            heapq.heappush(self._unassigned, item)
+        if not entry.breached:
+            heapq.heappush(self._deadlines, (entry.due, entry.seq, entry.escalation["id"]))
+
+    def _live(self, escalation_id: str, seq: int):
+        entry = self._entries.get(escalation_id)
+        return entry if entry is not None and entry.seq == seq else None
+
+    def remove(self, escalation_id: str):
+        """Drop an escalation from the queue; returns it, or None if it wasn't queued"""
+        entry = self._entries.pop(escalation_id, None)
+        if entry is None:
+            return None
+        ticket_id = entry.escalation["ticket_id"]
+        self._by_ticket[ticket_id].discard(escalation_id)
+        if not self._by_ticket[ticket_id]:
+            del self._by_ticket[ticket_id]
+        if entry.assignee:
+            self.loads[entry.assignee] -= 1
+            if self.loads[entry.assignee] <= 0:
+                del self.loads[entry.assignee]
+        else:
+            self.unassigned -= 1
+        self.breached_open -= entry.breached
+        self.removed_total += 1
+        self.version += 1
+        if len(self._open) > 2 * len(self._entries) + 64:
+            self._compact()
+        return entry.escalation
+
+    def remove_ticket(self, ticket_id: str) -> List[dict]:
+        """Drop every queued escalation of a ticket"""
+        return [self.remove(escalation_id) for escalation_id in list(self._by_ticket.get(ticket_id, ()))]
+
+    def _compact(self) -> None:
+        self._open, self._unassigned, self._deadlines = [], [], []
+        for entry in self._entries.values():
+            item = (entry.rank, entry.due, entry.seq, entry.escalation["id"])
+            self._open.append(item)
+            if not entry.assignee:
+                self._unassigned.append(item)
+            if not entry.breached:
+                self._deadlines.append((entry.due, entry.seq, entry.escalation["id"]))
+        for heap in (self._open, self._unassigned, self._deadlines):
+            heapq.heapify(heap)
+        self.version += 1
+
+    # -- worker ---------------------------------------------------------------
+
+    def pop_breached(self, now: float, limit: int) -> List[dict]:
+        """Up to ``limit`` escalations whose deadline passed by ``now``, earliest first; each is reported once"""
+        out = []
+        while self._deadlines and self._deadlines[0][0] <= now and len(out) < limit:
+            _, seq, escalation_id = heapq.heappop(self._deadlines)
+            entry = self._live(escalation_id, seq)
+            if entry is None or entry.breached:
+                continue
+            entry.breached = True
+            self.breached_open += 1
+            self.breached_total += 1
+            out.append(entry.escalation)
+        return out
+
+    def assign_batch(self, assignees: Sequence[str], limit: int) -> List[Tuple[dict, str]]:
+        """Hand up to ``limit`` of the most urgent unassigned escalations to the
+        least-loaded ``assignees`` (earlier names win ties); ``(escalation, assignee)`` pairs"""
+        out = []
+        order = {name: i for i, name in enumerate(assignees)}
+        while assignees and self._unassigned and len(out) < limit:
+            _, _, seq, escalation_id = heapq.heappop(self._unassigned)
+            entry = self._live(escalation_id, seq)
+            if entry is None or entry.assignee:
+                continue
+            assignee = min(assignees, key=lambda name: (self.loads[name], order[name]))
+            entry.assignee = assignee
+            self.loads[assignee] += 1
+            self.unassigned -= 1
+            self.assigned_total += 1
+            out.append((entry.escalation, assignee))
+        return out
+
+    # -- reads ----------------------------------------------------------------
+
+    def top(self, n: int) -> Iterator[dict]:
+        """The ``n`` most urgent escalations in order, read lazily off the heap.
+
+        Walks the heap's implicit tree with a small frontier heap, so the
+        first ``k`` items cost O(k log k) whatever the queue size. If the
+        queue changes between items, the walk starts again from the root and
+        skips escalations it already produced.
+        """
+        produced: Set[str] = set()
+        while len(produced) < n:
+            version, heap = self.version, self._open
+            frontier = [(heap[0], 0)] if heap else []
+            changed = False
+            while frontier and len(produced) < n:
+                item, i = heapq.heappop(frontier)
+                for child in (2 * i + 1, 2 * i + 2):
+                    if child < len(heap):
+                        heapq.heappush(frontier, (heap[child], child))
+                entry = self._live(item[3], item[2])
+                if entry is None or item[3] in produced:
+                    continue
+                produced.add(item[3])
+                yield entry.escalation
+                if self.version != version:
+                    changed = True
+                    break
+            if not changed:
+                return
+
+    def stats(self) -> dict:
+        return {
+            "open": len(self._entries),
+            "unassigned": self.unassigned,
+            "breached": self.breached_open,
+            "assigned_total": self.assigned_total,
+            "breached_total": self.breached_total,
+            "removed_total": self.removed_total,
+            "loads": dict(self.loads),
+        }
@@ -0,0 +1,103 @@
+"""Incremental NDJSON/CSV parsing for bulk imports"""
+import codecs
+import csv
+import json
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+NDJSON_TYPES = ("application/x-ndjson", "application/jsonl", "application/json-lines")
+CSV_TYPES = ("text/csv", "application/csv")
+
+# (row number, record or None, error or None); row numbers are 1-based lines of the upload
+ParsedRow = Tuple[int, Optional[dict], Optional[str]]
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decoded lines of a byte stream; only the current partial line is buffered"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line.rstrip("\r")
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer.rstrip("\r")
+
+
+def normalize_keys(record: dict, aliases: Dict[str, str]) -> dict:
+    """Lowercase, snake_case keys mapped through ``aliases``; blank values are dropped"""
+    out = {}
+    for key, value in record.items():
+        if value is None or (isinstance(value, str) and not value.strip()):
+            continue
+        key = str(key).strip().lower().replace(" ", "_")
+        out[aliases.get(key, key)] = value.strip() if isinstance(value, str) else value
+    return out
+
+
+async def parse_ndjson(lines: AsyncIterator[str], aliases: Dict[str, str]) -> AsyncIterator[ParsedRow]:
+    row = 0
+    async for line in lines:
+        row += 1
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield row, None, f"invalid JSON: {e.msg}"
+            continue
+        if not isinstance(record, dict):
+            yield row, None, "expected a JSON object"
+            continue
+        yield row, normalize_keys(record, aliases), None
+
+
+async def parse_csv(lines: AsyncIterator[str], aliases: Dict[str, str]) -> AsyncIterator[ParsedRow]:
+    """Rows keyed by the header line; quoted fields may span several lines"""
+    header: Optional[List[str]] = None
+    pending: List[str] = []
+    row = start = 0
+    async for line in lines:
+        row += 1
+        if not pending:
+            start = row
+        pending.append(line)
+        text = "\n".join(pending)
+        if text.count('"') % 2:
+            continue  # inside a quoted field that continues on the next line
+        pending = []
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = values
+            continue
+        if len(values) != len(header):
+            yield start, None, f"expected {len(header)} columns, got {len(values)}"
+            continue
+        yield start, normalize_keys(dict(zip(header, values)), aliases), None
+    if pending:
+        yield start, None, "unterminated quoted field"
+
+
+def parse_upload(chunks: AsyncIterator[bytes], content_type: str,
+                 aliases: Dict[str, str] = None) -> Optional[AsyncIterator[ParsedRow]]:
+    """Row iterator for an NDJSON or CSV body, or None for an unsupported content type"""
+    media_type = content_type.split(";")[0].strip().lower()
+    if media_type in NDJSON_TYPES:
+        return parse_ndjson(iter_lines(chunks), aliases or {})
+    if media_type in CSV_TYPES:
+        return parse_csv(iter_lines(chunks), aliases or {})
+    return None
+
+
+async def batched(rows: AsyncIterator[ParsedRow], size: int) -> AsyncIterator[List[ParsedRow]]:
+    batch: List[ParsedRow] = []
+    async for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -1,43 +1,171 @@
 """Enterprise Service Desk Agent - Backend (Claude-powered)"""
 import asyncio
+import base64
+import heapq
 import json
+import logging
 import os
+import re
+import time
 import uuid
-from datetime import datetime
+from contextlib import asynccontextmanager
+from contextvars import ContextVar, copy_context
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from itertools import islice
 from pathlib import Path
 
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-from pydantic import BaseModel, Field
-from typing import Optional, List
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError, field_validator
+from typing import Dict, Optional, List
 
 import anthropic
 
+from admission import AdmissionController, AdmissionRejected, SingleFlight
+from cache import MISSING, TTLCache
+from escalations import EscalationQueue
+from ingest import batched, parse_upload
+from metrics import MetricsMiddleware, Registry, current_trace, record_stage
+from router import IntentRouter, render_template
+from search import InvertedIndex, tokenize
+from sessions import Session, SessionStore
+from sse import SSEWriter
+from stats import TicketStats, naive_utc
+from store import StoreWriteError, open_store
+from vectors import VectorIndex
+
 # Load .env from mycelitree root
 env_path = Path(__file__).resolve().parents[2] / ".env"
 if not env_path.exists():
     env_path = Path(__file__).resolve().parents[3] / ".env"
 load_dotenv(env_path)
 
+logger = logging.getLogger(__name__)
+
 # Configuration
 ALLOWED_ORIGINS = os.getenv("ALLOWED_ORIGINS", "http://localhost:5173,http://localhost:3000,https://zimmer-poc.vercel.app").split(",")
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
 MODEL = "claude-sonnet-4-5-20250929"
 
+
+def parse_overrides(value: str) -> dict:
+    """Parse "name=number,name=number" settings into a dict of floats"""
+    return {
+        name.strip(): float(number)
+        for name, _, number in (item.partition("=") for item in value.split(",") if "=" in item)
+    }
+
+
+TOOL_TIMEOUT_SECONDS = float(os.getenv("TOOL_TIMEOUT_SECONDS", "10"))
+# Per-tool overrides, e.g. TOOL_TIMEOUTS="search_tickets=5,search_knowledge_base=3"
+TOOL_TIMEOUTS = parse_overrides(os.getenv("TOOL_TIMEOUTS", ""))
+TOOL_MAX_WORKERS = int(os.getenv("TOOL_MAX_WORKERS", "8"))
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "memory")
+SQLITE_PATH = os.getenv("SQLITE_PATH", "servicedesk.db")
+SQLITE_GROUP_COMMIT_MS = float(os.getenv("SQLITE_GROUP_COMMIT_MS", "5"))
+SQLITE_BATCH_SIZE = int(os.getenv("SQLITE_BATCH_SIZE", "256"))
+STORE_SYNC_INTERVAL = float(os.getenv("STORE_SYNC_INTERVAL", "2"))
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", "100"))
+ROUTER_ENABLED = os.getenv("ROUTER_ENABLED", "true").lower() == "true"
+ROUTER_MIN_CONFIDENCE = float(os.getenv("ROUTER_MIN_CONFIDENCE", "0.85"))
+# Per-intent overrides, e.g. ROUTER_THRESHOLDS="kb_lookup=0.9,list_tickets=0.95"
+ROUTER_THRESHOLDS = parse_overrides(os.getenv("ROUTER_THRESHOLDS", ""))
+# "llm": Claude writes the answer from the routed tool results; "template": canned answer, no LLM call
+ROUTER_NARRATIVE = os.getenv("ROUTER_NARRATIVE", "llm")
+TOOL_CACHE_TTL = float(os.getenv("TOOL_CACHE_TTL", "60"))
+TOOL_CACHE_SIZE = int(os.getenv("TOOL_CACHE_SIZE", "1024"))
+CHAT_CACHE_TTL = float(os.getenv("CHAT_CACHE_TTL", "300"))
+CHAT_CACHE_SIZE = int(os.getenv("CHAT_CACHE_SIZE", "512"))
+CHAT_MAX_CONCURRENCY = int(os.getenv("CHAT_MAX_CONCURRENCY", "16"))
+CHAT_MAX_QUEUE = int(os.getenv("CHAT_MAX_QUEUE", "64"))
+VECTOR_DIM = int(os.getenv("VECTOR_DIM", "512"))
+# Base path for the shared, memory-mapped ticket vector matrix; empty keeps it in memory
+VECTOR_INDEX_PATH = os.getenv("VECTOR_INDEX_PATH", "")
+DUPLICATE_THRESHOLD = float(os.getenv("DUPLICATE_THRESHOLD", "0.5"))
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+# Hours from escalation to SLA breach per ticket priority, e.g. ESCALATION_SLA_HOURS="P1=0.5,P2=2"
+ESCALATION_SLA_HOURS = {"P1": 1.0, "P2": 4.0, "P3": 24.0,
+                        **parse_overrides(os.getenv("ESCALATION_SLA_HOURS", ""))}
+ESCALATION_ASSIGNEES = [name.strip() for name in os.getenv(
+    "ESCALATION_ASSIGNEES",
+    "Chen, Michael;Rodriguez, Ana;Patel, Raj;Thompson, Sarah;Kim, David;Garcia, Maria",
+).split(";") if name.strip()]
+# Seconds between escalation worker passes; 0 disables the worker in this process.
+# With several processes on a shared store, only the holder of its lease runs it.
+ESCALATION_WORKER_INTERVAL = float(os.getenv("ESCALATION_WORKER_INTERVAL", "30"))
+ESCALATION_LEASE = "escalation-worker"
+WORKER_ID = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+ESCALATION_BATCH_SIZE = int(os.getenv("ESCALATION_BATCH_SIZE", "100"))
+SSE_FLUSH_MS = float(os.getenv("SSE_FLUSH_MS", "20"))
+SSE_MAX_CHUNK_CHARS = int(os.getenv("SSE_MAX_CHUNK_CHARS", "4096"))
+SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+# Optional pause after each streamed text chunk, for a typing effect; 0 sends text as it arrives
+SSE_PACING_MS = float(os.getenv("SSE_PACING_MS", "0"))
+SSE_GZIP = os.getenv("SSE_GZIP", "false").lower() == "true"
+SESSION_TOKEN_BUDGET = int(os.getenv("SESSION_TOKEN_BUDGET", "4000"))
+SESSION_TTL = float(os.getenv("SESSION_TTL", "1800"))
+SESSION_MAX = int(os.getenv("SESSION_MAX", "10000"))
+SESSION_MEMORY_MB = float(os.getenv("SESSION_MEMORY_MB", "64"))
+# Let clients request a per-stage timing breakdown with an X-Trace header
+TRACE_ENABLED = os.getenv("TRACE_ENABLED", "true").lower() == "true"
+MAX_PAGE_SIZE = 1000
+MAX_IMPORT_ERRORS = 1000
+TICKET_ID_ATTEMPTS = 3
+
 if not ANTHROPIC_API_KEY:
     raise RuntimeError(f"ANTHROPIC_API_KEY not found. Checked: {env_path}")
 
-client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
+client = anthropic.AsyncAnthropic(api_key=ANTHROPIC_API_KEY)
 
-app = FastAPI(title="Enterprise Service Desk Agent", version="2.0.0")
+# =============================================================================
+# Metrics
+# =============================================================================
+
+METRICS = Registry()
+HTTP_SECONDS = METRICS.histogram("servicedesk_http_request_seconds", "HTTP request duration (streamed bodies included)",
+                                 ["method", "route", "status"])
+LLM_CALL_SECONDS = METRICS.histogram("servicedesk_llm_call_seconds", "Claude call duration per tool-loop iteration",
+                                     ["iteration"])
+LLM_TTFT_SECONDS = METRICS.histogram("servicedesk_llm_time_to_first_token_seconds",
+                                     "Time from starting a Claude call to its first text token", ["iteration"])
+LLM_TOKENS = METRICS.counter("servicedesk_llm_tokens_total", "Claude tokens by kind", ["kind"])
+TOOL_SECONDS = METRICS.histogram("servicedesk_tool_seconds", "Tool execution time in the worker pool", ["tool"])
+TOOL_ERRORS = METRICS.counter("servicedesk_tool_errors_total", "Tool calls that timed out or failed", ["tool", "reason"])
+SEARCH_SECONDS = METRICS.histogram("servicedesk_search_seconds", "Search function latency", ["index"])
+CHAT_FIRST_BYTE_SECONDS = METRICS.histogram("servicedesk_chat_first_byte_seconds",
+                                            "Time from accepting a chat to its first SSE write", ["path"])
+SSE_WRITES = METRICS.counter("servicedesk_sse_writes_total", "SSE chunks written")
+SSE_BYTES = METRICS.counter("servicedesk_sse_bytes_total", "SSE bytes written (after compression)")
+ESCALATION_BREACHES = METRICS.counter("servicedesk_escalation_sla_breaches_total",
+                                      "Escalations that passed their SLA deadline", ["priority"])
+LLM_ITERATION_LABELS = ("1", "2", "3", "4+")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    sync_task = escalation_task = None
+    if STORAGE_BACKEND != "memory" and STORE_SYNC_INTERVAL > 0:
+        sync_task = asyncio.create_task(sync_store_loop())
+    if ESCALATION_WORKER_INTERVAL > 0:
+        escalation_task = asyncio.create_task(escalation_loop())
+    yield
+    for task in (sync_task, escalation_task):
+        if task:
+            task.cancel()
+    TICKET_STORE.close()
+
+app = FastAPI(title="Enterprise Service Desk Agent", version="2.0.0", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=ALLOWED_ORIGINS,
     allow_methods=["GET", "POST"],
-    allow_headers=["Content-Type"]
+    allow_headers=["Content-Type", "X-Trace"],
+    expose_headers=["X-Next-Cursor", "Retry-After", "Server-Timing"]
 )
+app.add_middleware(MetricsMiddleware, histogram=HTTP_SECONDS, tracing=TRACE_ENABLED)
 
 # =============================================================================
 # Data Models
@@ -46,6 +174,8 @@ app.add_middleware(
 class ChatRequest(BaseModel):
     message: str = Field(..., min_length=1, max_length=2000)
     role: str = Field(default="user", pattern="^(user|admin)$")
+    # Client-chosen conversation ID; follow-ups with the same ID see earlier turns
+    session_id: Optional[str] = Field(None, min_length=8, max_length=64, pattern=r"^[\w-]+$")
 
 class TicketCreateRequest(BaseModel):
     subject: str = Field(..., min_length=5, max_length=200)
@@ -57,11 +187,75 @@ class EscalationRequest(BaseModel):
     ticket_id: str
     reason: str = Field(..., min_length=10, max_length=500)
 
+class TicketResolveRequest(BaseModel):
+    resolution: str = Field(..., min_length=5, max_length=2000)
+
+# ServiceNow export columns -> import fields
+TICKET_IMPORT_ALIASES = {
+    "number": "id", "short_description": "subject", "state": "status", "assigned_to": "assigned",
+    "opened_at": "created", "sys_created_on": "created", "close_notes": "resolution",
+    "requester": "requester_email", "caller_email": "requester_email",
+}
+KB_IMPORT_ALIASES = {"number": "id", "short_description": "title", "text": "excerpt", "meta": "tags"}
+SERVICENOW_STATES = {"new": "Open", "on hold": "In Progress", "work in progress": "In Progress", "closed": "Resolved"}
+
+class TicketImportRow(TicketCreateRequest):
+    """A historical ticket for bulk import; ServiceNow priorities (1-5) and states are mapped"""
+    id: Optional[str] = Field(None, pattern=r"^[A-Z]{2,5}\d{4,}$")
+    status: str = Field(default="Open", pattern="^(Open|In Progress|Resolved|Escalated)$")
+    assigned: str = Field(default="Unassigned", max_length=200)
+    category: str = Field(default="General", max_length=100)
+    created: Optional[datetime] = None
+    resolved_at: Optional[datetime] = None
+    resolution: Optional[str] = Field(None, max_length=2000)
+
+    @field_validator("priority", mode="before")
+    @classmethod
+    def map_priority(cls, value):
+        text = str(value).strip()
+        if text[:1].isdigit():
+            return f"P{min(int(text[0]), 3)}"
+        return text.upper()
+
+    @field_validator("status", mode="before")
+    @classmethod
+    def map_status(cls, value):
+        text = str(value).strip()
+        return SERVICENOW_STATES.get(text.lower(), text.title() if text.islower() else text)
+
+    @field_validator("created", "resolved_at")
+    @classmethod
+    def drop_timezone(cls, value):
+        return naive_utc(value) if value else value
+
+class KBArticleImport(BaseModel):
+    id: str = Field(..., pattern=r"^KB\d+$")
+    title: str = Field(..., min_length=3, max_length=200)
+    excerpt: str = Field(..., min_length=10, max_length=4000)
+    tags: List[str] = []
+    steps: List[str] = []
+
+    # CSV cells carry lists as "a, b; c" (tags) and "step one | step two" or one step per line (steps)
+    @field_validator("tags", mode="before")
+    @classmethod
+    def split_tags(cls, value):
+        if isinstance(value, str):
+            return [tag.strip().lower() for tag in re.split(r"[,;]", value) if tag.strip()]
+        return value
+
+    @field_validator("steps", mode="before")
+    @classmethod
+    def split_steps(cls, value):
+        if isinstance(value, str):
+            return [step.strip() for step in re.split(r"[|\n]", value) if step.strip()]
+        return value
+
 # =============================================================================
 # In-Memory Data Store
 # =============================================================================
 
-TICKETS = [
+# Seed tickets, newest first
+SEED_TICKETS = [
     {"id": "INC0012847", "subject": "SAP integration failing for warehouse module", "priority": "P1", "status": "In Progress", "assigned": "Chen, Michael", "created": "2024-01-15", "category": "Infrastructure", "updated": "2 hours ago", "requester": "john.smith@company.com", "resolution": None},
     {"id": "INC0012901", "subject": "EDI 850 purchase orders not processing", "priority": "P2", "status": "Open", "assigned": "Rodriguez, Ana", "created": "2024-01-16", "category": "Data Integration", "updated": "45 min ago", "requester": "jane.doe@company.com", "resolution": None},
     {"id": "INC0012955", "subject": "SSO authentication timeout for Salesforce", "priority": "P1", "status": "Open", "assigned": "Patel, Raj", "created": "2024-01-17", "category": "Access", "updated": "12 min ago", "requester": "bob.wilson@company.com", "resolution": None},
@@ -79,7 +273,39 @@ KB_ARTICLES = [
     {"id": "KB0002789", "title": "Email Not Syncing on Mobile", "excerpt": "Troubleshoot Outlook mobile app sync issues. Covers account re-authentication and cache clearing.", "tags": ["email", "outlook", "mobile", "sync", "phone"], "steps": ["1. Remove account from Outlook app", "2. Clear app cache and data", "3. Re-add account with company email", "4. Allow 5-10 minutes for initial sync"]},
 ]
 
-ESCALATIONS = []
+# Storage backend: "memory" (default, per-process) or "sqlite" (durable, shared by workers)
+store_options = {}
+if STORAGE_BACKEND == "sqlite":
+    store_options = {"path": SQLITE_PATH, "group_commit_ms": SQLITE_GROUP_COMMIT_MS, "batch_size": SQLITE_BATCH_SIZE}
+TICKET_STORE = open_store(STORAGE_BACKEND, reversed(SEED_TICKETS), **store_options)
+_store_rev = TICKET_STORE.revision()
+
+TICKET_STATS = TicketStats()
+for _ticket in TICKET_STORE:
+    TICKET_STATS.on_create(_ticket)
+
+
+def sla_deadline(created: str, priority: str) -> str:
+    hours = ESCALATION_SLA_HOURS.get(priority, ESCALATION_SLA_HOURS["P3"])
+    return datetime.fromtimestamp(datetime.fromisoformat(created).timestamp() + hours * 3600).isoformat()
+
+
+def queue_escalation(escalation: dict) -> None:
+    """Add an open escalation to the SLA queue, filling in the priority and deadline
+    of escalations saved before they were recorded"""
+    if not escalation.get("sla_due"):
+        ticket = TICKET_STORE.get(escalation["ticket_id"]) or {}
+        escalation.setdefault("priority", ticket.get("priority", "P3"))
+        escalation["sla_due"] = sla_deadline(escalation["created"], escalation["priority"])
+    ESCALATION_QUEUE.push(escalation, datetime.fromisoformat(escalation["sla_due"]).timestamp())
+
+
+# Open escalations by ticket priority, then SLA deadline (per worker process)
+ESCALATION_QUEUE = EscalationQueue()
+for _escalation in TICKET_STORE.iter_escalations():
+    _ticket = TICKET_STORE.get(_escalation["ticket_id"])
+    if _escalation.get("status") != "Resolved" and (_ticket or {}).get("status") != "Resolved":
+        queue_escalation(_escalation)
 
 # =============================================================================
 # Tool definitions for Claude
@@ -124,6 +350,20 @@ TOOLS = [
             "required": ["query"]
         }
     },
+    {
+        "name": "get_ticket",
+        "description": "Look up a single ticket by its ID (e.g. INC0012847) to report its status, priority, assignee and last update. Use this when the user asks about a specific ticket.",
+        "input_schema": {
+            "type": "object",
+            "properties": {
+                "ticket_id": {
+                    "type": "string",
+                    "description": "Ticket ID, e.g. INC0012847"
+                }
+            },
+            "required": ["ticket_id"]
+        }
+    },
     {
         "name": "get_ticket_statistics",
         "description": "Get aggregate ticket statistics: open count, P1/P2 counts, average resolution time, and week-over-week trend. Use this when the user asks for stats, dashboards, metrics, or a summary overview.",
@@ -143,65 +383,145 @@ TITLE_MATCH_WEIGHT = 2
 TAG_MATCH_WEIGHT = 3
 EXCERPT_MATCH_WEIGHT = 1
 BASE_RELEVANCE = 0.6
-RELEVANCE_INCREMENT = 0.15
 MAX_RELEVANCE = 0.95
+KB_VECTOR_WEIGHT = 5.0
+KB_MIN_SIMILARITY = 0.2
+DUPLICATE_LIMIT = 3
+PRIORITY_ORDER = ("P1", "P2", "P3")
+BROAD_TICKET_KEYWORDS = ["ticket", "incident", "issue", "problem", "open", "p1", "priority", "my", "all", "show", "list"]
+
+TICKET_INDEX = InvertedIndex({"subject": 1.0, "category": 1.0}, facets=("status", "priority"))
+TICKET_INDEX.add_many(TICKET_STORE)
+
+KB_INDEX = InvertedIndex({"title": TITLE_MATCH_WEIGHT, "tags": TAG_MATCH_WEIGHT, "excerpt": EXCERPT_MATCH_WEIGHT})
+KB_INDEX.add_many(KB_ARTICLES)
+# Imported articles are kept in the store, so every worker serves them
+_kb_rev = TICKET_STORE.revision()
+KB_INDEX.add_many(TICKET_STORE.iter_kb_articles())
+
+
+def kb_text(kb: dict) -> str:
+    return " ".join([kb["title"], kb["excerpt"], " ".join(kb.get("tags", []))])
+
+
+def ticket_text(ticket: dict) -> str:
+    return " ".join(filter(None, [ticket["subject"], ticket.get("description"), ticket.get("category")]))
+
+
+def load_ticket_vectors() -> VectorIndex:
+    """Map the shared ticket matrix if a usable one was saved, else build it (and save it for other workers)"""
+    if VECTOR_INDEX_PATH and os.path.exists(VECTOR_INDEX_PATH + ".json"):
+        try:
+            index = VectorIndex.load(VECTOR_INDEX_PATH)
+            if index.dim != VECTOR_DIM:
+                raise ValueError(f"saved with dim {index.dim}, VECTOR_DIM is {VECTOR_DIM}")
+        except (OSError, KeyError, ValueError) as e:
+            logger.warning("Rebuilding ticket vectors, saved index unusable: %s", e)
+        else:
+            index.add_many([(t["id"], ticket_text(t)) for t in TICKET_STORE if t["id"] not in index])
+            return index
+    index = VectorIndex(VECTOR_DIM).fit((t["id"], ticket_text(t)) for t in TICKET_STORE)
+    if VECTOR_INDEX_PATH:
+        index.save(VECTOR_INDEX_PATH)
+    return index
+
+
+KB_VECTORS = VectorIndex(VECTOR_DIM).fit((kb_id, kb_text(kb)) for kb_id, kb in KB_INDEX.docs.items())
+TICKET_VECTORS = load_ticket_vectors()
+
+
+def _ticket_facets(status_filter: str = None, priority_filter: str = None) -> list:
+    """Index facets a ticket must belong to, so filters apply before scoring"""
+    within = []
+    if status_filter:
+        within.append(TICKET_INDEX.facet("status", status_filter))
+    if priority_filter:
+        within.append(TICKET_INDEX.facet("priority", priority_filter))
+    return within
+
+
+@SEARCH_SECONDS.time(stage="search_tickets", index="tickets")
+def search_tickets_fn(query: str, status_filter: str = None, priority_filter: str = None, limit: int = 5) -> list:
+    """Search tickets with BM25 relevance, ordered by priority then relevance.
+
+    Filters narrow the candidates before scoring, and the index stops walking
+    postings once no unseen ticket can make the top ``limit``.
+    """
+    within = _ticket_facets(status_filter, priority_filter)
+    hits, top_score = TICKET_INDEX.top(query, limit, within, order_by=None if priority_filter else "priority")
+    ranked = [(TICKET_INDEX.docs[tid], score) for tid, score in hits]
+
+    def relevance(score: float) -> float:
+        if not top_score:
+            return BASE_RELEVANCE
+        return round(min(MAX_RELEVANCE, BASE_RELEVANCE + (MAX_RELEVANCE - BASE_RELEVANCE) * score / top_score), 2)
+
+    results = [{**t, "relevance": relevance(score)} for t, score in ranked]
+
+    # Broad queries ("show open tickets") also list unscored tickets, which rank
+    # below scored tickets of the same priority but above lower priorities.
+    if any(kw in query.lower() for kw in BROAD_TICKET_KEYWORDS):
+        terms = set(tokenize(query))
+        unscored = []
+        for priority in PRIORITY_ORDER:
+            if priority_filter and priority != priority_filter:
+                continue
+            for t in TICKET_STORE.iter_where(status=status_filter, priority=priority):
+                if len(unscored) >= limit:
+                    break
+                if not TICKET_INDEX.matches(t["id"], terms):
+                    unscored.append({**t, "relevance": BASE_RELEVANCE})
+        results = heapq.nsmallest(limit, results + unscored, key=lambda x: (x["priority"], -x["relevance"]))
+
+    return results
+
+
+@SEARCH_SECONDS.time(stage="search_kb", index="kb")
+def search_kb_fn(query: str, limit: int = 3) -> list:
+    """Hybrid KB search: field-weighted BM25 plus hashed TF-IDF cosine similarity,
+    so paraphrased questions still reach the right article"""
+    lexical = KB_INDEX.scores(query)
+    dense = dict(KB_VECTORS.search(query, k=limit * 3, min_score=KB_MIN_SIMILARITY))
+    combined = {
+        kb_id: lexical.get(kb_id, 0.0) + KB_VECTOR_WEIGHT * dense.get(kb_id, 0.0)
+        for kb_id in lexical.keys() | dense.keys()
+    }
+    top = heapq.nlargest(limit, combined.items(), key=lambda item: item[1])
+    return [{**KB_INDEX.docs[kb_id], "score": round(score, 2)} for kb_id, score in top]
 
 
-def search_tickets_fn(query: str, status_filter: str = None, priority_filter: str = None) -> list:
-    """Search tickets with relevance scoring"""
-    query_lower = query.lower()
-    query_words = query_lower.split()
-    results = []
-
-    for t in TICKETS:
-        if status_filter and t["status"].lower() != status_filter.lower():
-            continue
-        if priority_filter and t["priority"] != priority_filter:
-            continue
-
-        score = sum(1 for word in query_words if word in t["subject"].lower() or word in t["category"].lower())
-
-        if score > 0 or any(kw in query_lower for kw in ["ticket", "incident", "issue", "problem", "open", "p1", "priority", "my", "all", "show", "list"]):
-            relevance = min(MAX_RELEVANCE, BASE_RELEVANCE + score * RELEVANCE_INCREMENT)
-            results.append({**t, "relevance": relevance})
+@SEARCH_SECONDS.time(stage="search_duplicates", index="duplicates")
+def find_duplicates(text: str, exclude_id: str = None, limit: int = DUPLICATE_LIMIT) -> list:
+    """Open tickets whose subject/description is close to ``text``"""
+    def is_open(ticket_id: str) -> bool:
+        ticket = TICKET_INDEX.docs.get(ticket_id)
+        return ticket_id != exclude_id and ticket is not None and ticket["status"] != "Resolved"
 
-    return sorted(results, key=lambda x: (x["priority"], -x.get("relevance", 0)))[:5]
+    hits = TICKET_VECTORS.search(text, k=limit, min_score=DUPLICATE_THRESHOLD, predicate=is_open)
+    return [
+        {**{f: TICKET_INDEX.docs[tid][f] for f in ("id", "subject", "status", "priority")}, "similarity": score}
+        for tid, score in hits
+    ]
 
 
-def search_kb_fn(query: str) -> list:
-    """Search knowledge base with weighted scoring"""
-    query_lower = query.lower()
-    query_words = [w for w in query_lower.split() if len(w) > 2]
-    results = []
+def get_ticket_stats_fn() -> dict:
+    """Ticket statistics from the incrementally maintained counters"""
+    return TICKET_STATS.snapshot()
 
-    for kb in KB_ARTICLES:
-        score = 0
-        for word in query_words:
-            if word in kb["title"].lower():
-                score += TITLE_MATCH_WEIGHT
-            if word in kb.get("tags", []):
-                score += TAG_MATCH_WEIGHT
-            if word in kb["excerpt"].lower():
-                score += EXCERPT_MATCH_WEIGHT
-        if score > 0:
-            results.append({**kb, "score": score})
 
-    return sorted(results, key=lambda x: x["score"], reverse=True)[:3]
-
-
-def get_ticket_stats_fn() -> dict:
-    """Calculate ticket statistics"""
-    return {
-        "total_open": len([t for t in TICKETS if t["status"] != "Resolved"]),
-        "p1_count": len([t for t in TICKETS if t["priority"] == "P1" and t["status"] != "Resolved"]),
-        "p2_count": len([t for t in TICKETS if t["priority"] == "P2" and t["status"] != "Resolved"]),
-        "avg_resolution_time": "4.2 hours",
-        "trend": "↓ 12%"
-    }
+def get_ticket_fn(ticket_id: str) -> dict:
+    """Look up one ticket by ID"""
+    ticket = TICKET_STORE.get(ticket_id.strip().upper())
+    return ticket or {"error": f"Ticket {ticket_id} not found"}
 
 
 def execute_tool(name: str, input_data: dict):
     """Execute a tool by name and return the result"""
+    with TOOL_SECONDS.time(stage=f"tool_{name}", tool=name):
+        return _execute_tool(name, input_data)
+
+
+def _execute_tool(name: str, input_data: dict):
     if name == "search_tickets":
         return search_tickets_fn(
             input_data["query"],
@@ -210,10 +530,156 @@ def execute_tool(name: str, input_data: dict):
         )
     elif name == "search_knowledge_base":
         return search_kb_fn(input_data["query"])
+    elif name == "get_ticket":
+        return get_ticket_fn(input_data["ticket_id"])
     elif name == "get_ticket_statistics":
         return get_ticket_stats_fn()
     return {"error": f"Unknown tool: {name}"}
 
+
+TOOL_EXECUTOR = ThreadPoolExecutor(max_workers=TOOL_MAX_WORKERS, thread_name_prefix="tool")
+
+
+# =============================================================================
+# Caching
+# =============================================================================
+
+TOOL_CACHE = TTLCache(max_entries=TOOL_CACHE_SIZE, ttl=TOOL_CACHE_TTL)
+CHAT_CACHE = TTLCache(max_entries=CHAT_CACHE_SIZE, ttl=CHAT_CACHE_TTL)
+
+# Data tags the current chat's tools read from, with the chat cache's invalidation
+# counter for each as of the first read; None outside a cached chat
+_chat_deps: ContextVar[Optional[dict]] = ContextVar("chat_deps", default=None)
+UNCACHEABLE = "uncacheable"
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.lower().split()).strip(" ?!.")
+
+
+def tool_cache_key(name: str, input_data: dict) -> tuple:
+    normalized = {**input_data}
+    if isinstance(normalized.get("query"), str):
+        normalized["query"] = normalize_text(normalized["query"])
+    return (name, json.dumps(normalized, sort_keys=True))
+
+
+def ticket_partition_tags(status: str, priority: str) -> list:
+    """Tags of every ticket search whose status/priority filters admit this combination"""
+    status, priority = status.lower(), priority.upper()
+    return [f"tickets:{status}:{priority}", f"tickets:{status}:*", f"tickets:*:{priority}", "tickets:*:*"]
+
+
+def tool_cache_tags(name: str, input_data: dict) -> list:
+    """Data a tool result depends on, matching what invalidate_ticket_caches drops"""
+    if name == "search_tickets":
+        status = (input_data.get("status_filter") or "*").lower()
+        priority = (input_data.get("priority_filter") or "*").upper()
+        return [f"tickets:{status}:{priority}"]
+    if name == "search_knowledge_base":
+        return ["kb"]
+    if name == "get_ticket":
+        return [f"ticket:{str(input_data.get('ticket_id', '')).strip().upper()}"]
+    if name == "get_ticket_statistics":
+        return ["stats"]
+    return []
+
+
+def ticket_cache_tags(ticket: dict, old_status: str = None) -> set:
+    """Tags of cached tool results and chats that could see this ticket's new or old state"""
+    tags = {"stats", f"ticket:{ticket['id']}"}
+    for status in {ticket["status"], old_status} - {None}:
+        tags.update(ticket_partition_tags(status, ticket["priority"]))
+    return tags
+
+
+def invalidate_caches(tags) -> None:
+    TOOL_CACHE.invalidate(tags)
+    CHAT_CACHE.invalidate(tags)
+
+
+def invalidate_ticket_caches(ticket: dict, old_status: str = None) -> None:
+    invalidate_caches(ticket_cache_tags(ticket, old_status))
+
+
+async def run_tool(name: str, input_data: dict):
+    """Run a tool off the event loop, returning a structured error on timeout or failure.
+
+    Successful results are cached by tool name and normalized input, unless
+    one of the tool's tags was invalidated while it ran.
+    """
+    tags = tool_cache_tags(name, input_data)
+    deps = _chat_deps.get()
+    if deps is not None:
+        for tag, generation in CHAT_CACHE.generations(tags).items():
+            deps.setdefault(tag, generation)
+    generations = TOOL_CACHE.generations(tags)
+    key = tool_cache_key(name, input_data)
+    cached = TOOL_CACHE.get(key)
+    if cached is not MISSING:
+        return cached
+
+    timeout = TOOL_TIMEOUTS.get(name, TOOL_TIMEOUT_SECONDS)
+    loop = asyncio.get_running_loop()
+    try:
+        # Run in a copy of this context so the tool's timings reach the request trace
+        call = loop.run_in_executor(TOOL_EXECUTOR, copy_context().run, execute_tool, name, input_data)
+        result = await asyncio.wait_for(call, timeout)
+    except asyncio.TimeoutError:
+        TOOL_ERRORS.inc(tool=name, reason="timeout")
+        result = {"error": f"Tool {name} timed out after {timeout:g}s", "tool": name, "timeout": timeout}
+    except Exception as e:
+        TOOL_ERRORS.inc(tool=name, reason="exception")
+        result = {"error": f"Tool {name} failed: {e}", "tool": name}
+
+    if is_tool_error(result):
+        if deps is not None:
+            deps[UNCACHEABLE] = 0
+    else:
+        TOOL_CACHE.set(key, result, tags, generations)
+    return result
+
+
+def is_tool_error(result) -> bool:
+    return isinstance(result, dict) and "error" in result
+
+
+def context_card(tool_name: str, result):
+    """Frontend context card for a tool result, or None if it has nothing to show"""
+    if is_tool_error(result):
+        return None
+    if tool_name == "search_tickets":
+        return ("tickets", result)
+    if tool_name == "search_knowledge_base":
+        return ("kb_articles", result) if result else None
+    if tool_name == "get_ticket":
+        return ("ticket_status", result)
+    if tool_name == "get_ticket_statistics":
+        return ("stats", result)
+    return None
+
+
+async def run_tool_turn(calls: list):
+    """Run one turn's ``(tool_use_id, name, input)`` calls concurrently.
+
+    Returns the results, the ``tool_result`` blocks for the next model call and
+    the new context cards, all in call order.
+    """
+    results = await asyncio.gather(*(run_tool(name, tool_input) for _, name, tool_input in calls))
+    tool_use_results = []
+    cards = []
+    for (tool_use_id, name, _), result in zip(calls, results):
+        card = context_card(name, result)
+        if card:
+            cards.append(card)
+        tool_use_results.append({
+            "type": "tool_result",
+            "tool_use_id": tool_use_id,
+            "content": json.dumps(result),
+            "is_error": is_tool_error(result),
+        })
+    return results, tool_use_results, cards
+
 # =============================================================================
 # Claude-Powered Response Generator
 # =============================================================================
@@ -240,142 +706,511 @@ Guidelines:
 - The resolution steps and KB articles will be displayed in separate cards, so just reference them"""
 
 
-async def generate_claude_response(message: str, role: str):
-    """Generate a Claude-powered streaming response with tool use"""
-    system_prompt = SYSTEM_PROMPT_ADMIN if role == "admin" else SYSTEM_PROMPT_USER
+def build_request_scaffold(system_prompt: str) -> dict:
+    """Static request fields for one role, built once at startup.
 
-    messages = [{"role": "user", "content": message}]
+    The last tool definition and the system prompt carry ``cache_control``
+    breakpoints, so the tools prefix is cached across both roles and the
+    tools+system prefix per role; only ``messages`` varies between calls.
+    """
+    tools = [dict(tool) for tool in TOOLS]
+    tools[-1]["cache_control"] = {"type": "ephemeral"}
+    return {
+        "model": MODEL,
+        "max_tokens": 1024,
+        "system": [{"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}],
+        "tools": tools,
+    }
 
-    # First call: let Claude decide which tools to use
-    response = client.messages.create(
-        model=MODEL,
-        max_tokens=1024,
-        system=system_prompt,
-        tools=TOOLS,
-        messages=messages,
-    )
 
-    tools_used = []
-    tool_results = []
-    context_cards = []
-    final_text = ""
-
-    # Process the response — handle tool use loop
-    while response.stop_reason == "tool_use":
-        # Collect all tool uses from this response
-        assistant_content = response.content
-        tool_use_results = []
-
-        for block in assistant_content:
-            if block.type == "tool_use":
-                tool_name = block.name
-                tool_input = block.input
-                tool_id = block.id
-
-                # Map tool names for the frontend
-                tools_used.append(tool_name)
-
-                # Execute the tool
-                result = execute_tool(tool_name, tool_input)
-
-                # Build context card for frontend
-                if tool_name == "search_tickets":
-                    context_cards.append(("tickets", result))
-                elif tool_name == "search_knowledge_base":
-                    if result:
-                        context_cards.append(("kb_articles", result))
-                elif tool_name == "get_ticket_statistics":
-                    context_cards.append(("stats", result))
-
-                tool_use_results.append({
-                    "type": "tool_result",
-                    "tool_use_id": tool_id,
-                    "content": json.dumps(result),
-                })
-
-        # Send tool results back to Claude for the final response
-        messages.append({"role": "assistant", "content": assistant_content})
-        messages.append({"role": "user", "content": tool_use_results})
+REQUEST_SCAFFOLD = {
+    "admin": build_request_scaffold(SYSTEM_PROMPT_ADMIN),
+    "user": build_request_scaffold(SYSTEM_PROMPT_USER),
+}
 
-        response = client.messages.create(
-            model=MODEL,
-            max_tokens=1024,
-            system=system_prompt,
-            tools=TOOLS,
-            messages=messages,
-        )
+USAGE_FIELDS = ("input_tokens", "output_tokens", "cache_read_input_tokens", "cache_creation_input_tokens")
+
+# Process-wide token usage across all chats, reported by /health
+LLM_USAGE = {"llm_calls": 0, **dict.fromkeys(USAGE_FIELDS, 0)}
+
+
+def record_usage(totals: dict, usage) -> None:
+    totals["llm_calls"] += 1
+    for field in USAGE_FIELDS:
+        count = getattr(usage, field, None) or 0
+        totals[field] += count
+        LLM_TOKENS.inc(count, kind=field.replace("_tokens", ""))
+
+
+def usage_summary(totals: dict) -> dict:
+    """Token counts plus the share of prompt tokens served from the prompt cache"""
+    prompt_tokens = totals["input_tokens"] + totals["cache_read_input_tokens"] + totals["cache_creation_input_tokens"]
+    hit_ratio = totals["cache_read_input_tokens"] / prompt_tokens if prompt_tokens else 0.0
+    return {**totals, "cache_hit_ratio": round(hit_ratio, 3)}
+
+
+async def generate_claude_response(message: str, role: str, routed: list = None,
+                                   history: list = None, calls_log: list = None):
+    """Generate a Claude-powered streaming response with tool use.
+
+    Each model turn is streamed; text deltas are forwarded as ``token`` events
+    as they arrive, and tool/context events are emitted as soon as a turn's
+    tools have run, so the frontend never waits for the final answer.
+
+    ``routed`` holds ``(tool_use_id, name, input, result)`` calls the intent
+    router already ran; they are replayed as the first tool turn so Claude
+    only has to write the answer.
 
-    # Extract final text
-    for block in response.content:
-        if hasattr(block, "text"):
-            final_text += block.text
+    ``history`` is the session's earlier conversation ending with ``message``;
+    tools Claude calls are appended to ``calls_log`` as ``(name, input, result)``.
+    """
+    scaffold = REQUEST_SCAFFOLD["admin" if role == "admin" else "user"]
 
-    # --- Stream everything to the frontend in the existing SSE protocol ---
+    messages = list(history) if history else [{"role": "user", "content": message}]
 
-    # 1. Stream tool indicators
-    if tools_used:
-        yield f"data: {json.dumps({'type': 'tools', 'tools': tools_used})}\n\n"
-        await asyncio.sleep(0.1)
+    usage = {"llm_calls": 0, **dict.fromkeys(USAGE_FIELDS, 0)}
+    tools_used = []
+    context_cards = []
+    text_emitted = False
+
+    if routed:
+        tools_used = [name for _, name, _, _ in routed]
+        messages.append({"role": "assistant", "content": [
+            {"type": "tool_use", "id": tool_use_id, "name": name, "input": tool_input}
+            for tool_use_id, name, tool_input, _ in routed
+        ]})
+        messages.append({"role": "user", "content": [
+            {"type": "tool_result", "tool_use_id": tool_use_id, "content": json.dumps(result),
+             "is_error": is_tool_error(result)}
+            for tool_use_id, _, _, result in routed
+        ]})
+
+    iteration = 0
+    while True:
+        iteration += 1
+        label = LLM_ITERATION_LABELS[min(iteration, len(LLM_ITERATION_LABELS)) - 1]
+        turn_has_text = False
+        call_started = time.perf_counter()
+        first_token = None
+        async with client.messages.stream(**scaffold, messages=messages) as stream:
+            async for text in stream.text_stream:
+                if not text:
+                    continue
+                if first_token is None:
+                    first_token = time.perf_counter() - call_started
+                    LLM_TTFT_SECONDS.observe(first_token, iteration=label)
+                    record_stage(f"llm_{iteration}_ttft", first_token)
+                # Separate text from an earlier turn (e.g. "Let me check...")
+                if text_emitted and not turn_has_text:
+                    text = "\n\n" + text
+                turn_has_text = text_emitted = True
+                yield {"type": "token", "content": text}
+            response = await stream.get_final_message()
+        call_seconds = time.perf_counter() - call_started
+        LLM_CALL_SECONDS.observe(call_seconds, iteration=label)
+        record_stage(f"llm_{iteration}", call_seconds)
+        record_usage(usage, response.usage)
+
+        if response.stop_reason != "tool_use":
+            break
 
-    # 2. Stream context cards
-    for ctx_type, ctx_data in context_cards:
-        yield f"data: {json.dumps({'type': 'context', 'context_type': ctx_type, 'data': ctx_data})}\n\n"
-        await asyncio.sleep(0.1)
+        # Run every tool the model asked for in this turn concurrently;
+        # results come back in block order so cards and tool_results are deterministic
+        calls = [(block.id, block.name, block.input) for block in response.content if block.type == "tool_use"]
+        results, tool_use_results, new_cards = await run_tool_turn(calls)
+        tools_used.extend(name for _, name, _ in calls)
+        if calls_log is not None:
+            calls_log.extend((name, tool_input, result) for (_, name, tool_input), result in zip(calls, results))
+
+        yield {"type": "tools", "tools": tools_used}
+        for ctx_type, ctx_data in new_cards:
+            yield {"type": "context", "context_type": ctx_type, "data": ctx_data}
+        context_cards.extend(new_cards)
+
+        # Send tool results back to Claude for the next turn
+        messages.append({"role": "assistant", "content": response.content})
+        messages.append({"role": "user", "content": tool_use_results})
 
-    # 3. Stream response text token-by-token
-    words = final_text.split()
-    for word in words:
-        yield f"data: {json.dumps({'type': 'token', 'content': word + ' '})}\n\n"
-        await asyncio.sleep(0.02)
+    # For user role: always offer escalation, whether or not KB results were found
+    if role == "user":
+        yield {"type": "action", "action": "show_escalate_option"}
+
+    for field, value in usage.items():
+        LLM_USAGE[field] += value
+    yield {"type": "usage", "usage": usage_summary(usage)}
+
+    yield {"type": "done"}
+
+ROUTER = IntentRouter(min_confidence=ROUTER_MIN_CONFIDENCE, thresholds=ROUTER_THRESHOLDS, enabled=ROUTER_ENABLED)
+
+
+async def generate_chat_response(message: str, role: str, history: list = None, calls_log: list = None):
+    """Answer obvious intents on the fast path, everything else through the Claude tool loop.
+
+    Routed tools run before any model call and their context cards stream
+    immediately. The answer text then comes from a template (no LLM call) or
+    from a single Claude call that sees the routed results; templates that
+    cannot describe the results fall back to Claude too.
+    """
+    route = ROUTER.route(message)
+    if route is None:
+        async for event in generate_claude_response(message, role, history=history, calls_log=calls_log):
+            yield event
+        return
+
+    calls = [(f"toolu_route_{i}", name, tool_input) for i, (name, tool_input) in enumerate(route.calls)]
+    results, _, cards = await run_tool_turn(calls)
+    if calls_log is not None:
+        calls_log.extend((name, tool_input, result) for (_, name, tool_input), result in zip(calls, results))
+    yield {"type": "tools", "tools": [name for _, name, _ in calls]}
+    for ctx_type, ctx_data in cards:
+        yield {"type": "context", "context_type": ctx_type, "data": ctx_data}
+
+    text = render_template(route.intent, results) if ROUTER_NARRATIVE == "template" else None
+    if text is None:
+        routed = [(tool_use_id, name, tool_input, result) for (tool_use_id, name, tool_input), result in zip(calls, results)]
+        async for event in generate_claude_response(message, role, routed=routed,
+                                                    history=history, calls_log=calls_log):
+            yield event
+        return
+
+    ROUTER.decisions[f"template:{route.intent}"] += 1
+    yield {"type": "token", "content": text}
+    if role == "user":
+        yield {"type": "action", "action": "show_escalate_option"}
+    yield {"type": "done"}
+
+
+def chat_cache_key(message: str, role: str) -> tuple:
+    return (role, normalize_text(message))
+
+
+async def replay_events(events: list):
+    for event in events:
+        yield event
+
+
+async def record_chat_response(message: str, role: str, calls: list):
+    """Generate a chat and cache its outcome.
+
+    Outcomes (the events, and the tool calls appended to ``calls`` as
+    ``(name, input, result)``) are keyed by role and normalized message and
+    tagged with the data their tools read, so ticket writes evict exactly the
+    affected chats. Chats whose tools failed, or whose data changed while they
+    ran, are not cached.
+    """
+    deps = {}
+    _chat_deps.set(deps)
+    recorded = []
+    try:
+        async for event in generate_chat_response(message, role, calls_log=calls):
+            if event["type"] != "usage":
+                recorded.append(event)
+            yield event
+    finally:
+        _chat_deps.set(None)
+    if UNCACHEABLE not in deps:
+        CHAT_CACHE.set(chat_cache_key(message, role), (recorded, calls), deps, deps)
+
+
+CHAT_ADMISSION = AdmissionController(max_concurrent=CHAT_MAX_CONCURRENCY, max_queue=CHAT_MAX_QUEUE)
+CHAT_FLIGHTS = SingleFlight()
+
+
+def reserve_chat_slot(role: str) -> "asyncio.Future":
+    """Admission slot for a new chat computation (admins ahead of users), or 429 when the queue is full"""
+    try:
+        return CHAT_ADMISSION.reserve(priority=0 if role == "admin" else 1)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=429,
+            detail="The assistant is busy. Please retry shortly.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
 
-    # 4. For user role: offer escalation if no KB results found
-    if role == "user" and not any(ct == "kb_articles" for ct, _ in context_cards):
-        yield f"data: {json.dumps({'type': 'action', 'action': 'show_escalate_option'})}\n\n"
-    elif role == "user" and any(ct == "kb_articles" for ct, _ in context_cards):
-        yield f"data: {json.dumps({'type': 'action', 'action': 'show_escalate_option'})}\n\n"
 
-    yield f"data: {json.dumps({'type': 'done'})}\n\n"
+async def admitted(slot: "asyncio.Future", events):
+    """Wait for an admission slot, then stream ``events``, holding the slot until they end.
+
+    A caller cancelled while still queued never held the slot (its future is
+    cancelled, so ``release`` skips it); one granted a slot always returns it.
+    """
+    started = None
+    try:
+        await slot
+        started = time.monotonic()
+        async for event in events:
+            yield event
+    finally:
+        if not slot.cancelled():
+            CHAT_ADMISSION.release(time.monotonic() - started if started is not None else None)
+
+
+SESSIONS = SessionStore(token_budget=SESSION_TOKEN_BUDGET, ttl=SESSION_TTL, max_sessions=SESSION_MAX,
+                        max_bytes=int(SESSION_MEMORY_MB * 1024 * 1024))
+
+
+async def session_chat_response(message: str, role: str, session: Session):
+    """One turn of a multi-turn conversation: Claude sees the session's history,
+    and the turn (message, tool calls, answer) is recorded once it completes"""
+    async with session.lock:
+        calls, answer = [], []
+        history = SESSIONS.messages(session, message)
+        async for event in generate_chat_response(message, role, history=history, calls_log=calls):
+            if event["type"] == "token":
+                answer.append(event["content"])
+            yield event
+        SESSIONS.record(session, message, calls, "".join(answer))
+
+
+async def first_turn_response(message: str, session: Session, events, calls: list):
+    """A session's opening turn served from the shared chat path, recorded as
+    its first turn (with the computation's tool ``calls``) once it completes"""
+    async with session.lock:
+        answer = []
+        async for event in events:
+            if event["type"] == "token":
+                answer.append(event["content"])
+            yield event
+        SESSIONS.record(session, message, calls, "".join(answer))
+
+
+SSE_WRITER = SSEWriter(flush_interval=SSE_FLUSH_MS / 1000, max_chunk_chars=SSE_MAX_CHUNK_CHARS,
+                       heartbeat_interval=SSE_HEARTBEAT_SECONDS, pacing=SSE_PACING_MS / 1000)
+
+
+async def traced(events, stages: list):
+    """``events`` followed by a ``trace`` event with the stage timings recorded while they ran"""
+    async for event in events:
+        yield event
+    yield {"type": "trace", "stages": [{"stage": stage, "ms": round(seconds * 1000, 1)} for stage, seconds in stages]}
+
+
+async def metered(chunks, path: str):
+    started = time.perf_counter()
+    first = True
+    async for chunk in chunks:
+        if first:
+            first = False
+            elapsed = time.perf_counter() - started
+            CHAT_FIRST_BYTE_SECONDS.observe(elapsed, path=path)
+            record_stage("first_byte", elapsed)
+        SSE_WRITES.inc()
+        SSE_BYTES.inc(len(chunk))
+        yield chunk
+
+
+def sse_response(events, http_request: Request, path: str) -> StreamingResponse:
+    """Stream chat events through the SSE writer, gzipped when enabled and accepted by the client.
+
+    Traced requests get their stage breakdown as a final ``trace`` event,
+    since the headers have gone out before most stages run.
+    """
+    stages = current_trace()
+    if stages is not None:
+        events = traced(events, stages)
+    compress = SSE_GZIP and "gzip" in http_request.headers.get("accept-encoding", "")
+    # Keep proxies from buffering the stream
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    if compress:
+        headers.update({"Content-Encoding": "gzip", "Vary": "Accept-Encoding"})
+    return StreamingResponse(metered(SSE_WRITER.stream(events, compress=compress), path),
+                             media_type="text/event-stream", headers=headers)
 
 # =============================================================================
 # Ticket Management
 # =============================================================================
 
-def create_ticket(request: TicketCreateRequest) -> dict:
-    ticket_id = f"INC{str(uuid.uuid4().int)[:7]}"
+def new_ticket_id() -> str:
+    # Seven random digits collide quickly at bulk-import volumes, so skip IDs in use,
+    # including ones other workers have written but this worker hasn't synced yet
+    while True:
+        ticket_id = f"INC{str(uuid.uuid4().int)[:7]}"
+        if ticket_id not in TICKET_INDEX.docs and ticket_id not in TICKET_STORE:
+            return ticket_id
+
+
+def index_tickets(tickets: List[dict]) -> None:
+    """Fold new tickets into the search indexes, vectors and stats, one pass per index"""
+    TICKET_INDEX.add_many(tickets)
+    TICKET_VECTORS.add_many([(ticket["id"], ticket_text(ticket)) for ticket in tickets])
+    tags = set()
+    for ticket in tickets:
+        TICKET_STATS.on_create(ticket)
+        tags |= ticket_cache_tags(ticket)
+    invalidate_caches(tags)
+
+
+async def add_tickets(tickets: List[dict]) -> Dict[str, BaseException]:
+    """Store tickets, then index the ones that became durable; returns the failures by ticket id"""
+    TICKET_STORE.add_many(tickets)
+    try:
+        await TICKET_STORE.commit()
+        failures = {}
+    except StoreWriteError as e:
+        failures = e.failures
+    index_tickets([ticket for ticket in tickets if ticket["id"] not in failures])
+    return failures
+
+
+async def create_ticket(request: TicketCreateRequest) -> dict:
+    now = datetime.now()
     new_ticket = {
-        "id": ticket_id,
+        "id": new_ticket_id(),
         "subject": request.subject,
         "priority": request.priority,
         "status": "Open",
         "assigned": "Unassigned",
-        "created": datetime.now().strftime("%Y-%m-%d"),
+        "created": now.strftime("%Y-%m-%d"),
+        "created_at": now.isoformat(timespec="seconds"),
         "category": "General",
         "updated": "Just now",
         "requester": request.requester_email,
         "resolution": None,
         "description": request.description
     }
-    TICKETS.insert(0, new_ticket)
-    return new_ticket
-
-
-def escalate_ticket(ticket_id: str, reason: str) -> dict:
+    for _ in range(TICKET_ID_ATTEMPTS):
+        failures = await add_tickets([new_ticket])
+        if not failures:
+            return new_ticket
+        # Another worker took the ID between the check and the insert
+        if new_ticket["id"] not in TICKET_STORE:
+            break
+        new_ticket["id"] = new_ticket_id()
+    raise StoreWriteError(failures)
+
+
+async def set_ticket_status(ticket_id: str, status: str, **fields) -> Optional[dict]:
+    """Change a ticket's status (and any other ``fields``) and, once that is durable,
+    the search index and statistics; resolving it also closes its escalations"""
+    ticket = TICKET_STORE.get(ticket_id)
+    if not ticket:
+        return None
+    old_status = ticket["status"]
+    changes = {**fields, "status": status, "updated": "Just now"}
+    if status == "Resolved" and not ticket.get("resolved_at"):
+        changes["resolved_at"] = datetime.now().isoformat(timespec="seconds")
+    ticket = TICKET_STORE.update(ticket_id, **changes)
+    await TICKET_STORE.commit()
+    TICKET_INDEX.update(ticket)
+    TICKET_STATS.on_status_change(ticket, old_status)
+    invalidate_ticket_caches(ticket, old_status)
+    if status == "Resolved":
+        for escalation in ESCALATION_QUEUE.remove_ticket(ticket_id):
+            update_escalation(escalation, status="Resolved", resolved_at=ticket["resolved_at"])
+        await TICKET_STORE.commit()
+    return ticket
+
+
+def update_escalation(escalation: dict, **changes) -> None:
+    escalation.update(changes)
+    TICKET_STORE.update_escalation(escalation["id"], **changes)
+
+
+async def escalate_ticket(ticket_id: str, reason: str) -> dict:
+    ticket = TICKET_STORE.get(ticket_id) or {}
+    created = datetime.now().isoformat()
+    priority = ticket.get("priority", "P3")
     escalation = {
         "id": f"ESC{str(uuid.uuid4().int)[:7]}",
         "ticket_id": ticket_id,
         "reason": reason,
-        "created": datetime.now().isoformat(),
-        "status": "Pending Review"
+        "created": created,
+        "status": "Pending Review",
+        "priority": priority,
+        "sla_due": sla_deadline(created, priority),
+        "assigned_to": None,
+        "sla_breached": False,
     }
-    ESCALATIONS.append(escalation)
-    for t in TICKETS:
-        if t["id"] == ticket_id:
-            t["status"] = "Escalated"
-            t["updated"] = "Just now"
-            break
+    TICKET_STORE.add_escalation(escalation)
+    await set_ticket_status(ticket_id, "Escalated")
+    await TICKET_STORE.commit()
+    queue_escalation(escalation)
     return escalation
 
 
+async def process_escalations(now: float = None) -> dict:
+    """Flag SLA breaches, then hand the most urgent unassigned escalations to the
+    least-loaded assignees, a batch at a time so chats keep being served"""
+    now = time.time() if now is None else now
+    stamp = datetime.fromtimestamp(now).isoformat(timespec="seconds")
+    breached = assigned = 0
+    while batch := ESCALATION_QUEUE.pop_breached(now, ESCALATION_BATCH_SIZE):
+        for escalation in batch:
+            update_escalation(escalation, sla_breached=True, breached_at=stamp)
+            ESCALATION_BREACHES.inc(priority=escalation["priority"])
+        breached += len(batch)
+        await asyncio.sleep(0)
+    while pairs := ESCALATION_QUEUE.assign_batch(ESCALATION_ASSIGNEES, ESCALATION_BATCH_SIZE):
+        for escalation, assignee in pairs:
+            update_escalation(escalation, status="Assigned", assigned_to=assignee, assigned_at=stamp)
+        assigned += len(pairs)
+        await asyncio.sleep(0)
+    if breached or assigned:
+        await TICKET_STORE.commit()
+    return {"breached": breached, "assigned": assigned}
+
+
+async def escalation_loop():
+    """Run the escalation worker while this process holds the store's lease.
+
+    The lease outlives three missed passes, so another process takes over
+    if this one stops; it first folds in the assignments made so far.
+    """
+    while True:
+        await asyncio.sleep(ESCALATION_WORKER_INTERVAL)
+        try:
+            leader = await asyncio.to_thread(TICKET_STORE.acquire_lease, ESCALATION_LEASE, WORKER_ID,
+                                             3 * ESCALATION_WORKER_INTERVAL)
+            if not leader:
+                continue
+            if STORAGE_BACKEND != "memory":
+                apply_store_changes()
+            await process_escalations()
+        except Exception:
+            logger.exception("Escalation worker failed")
+
+
+def apply_store_changes() -> int:
+    """Fold tickets and KB articles written by other workers into this worker's search indexes and stats"""
+    global _store_rev, _kb_rev
+    articles, _kb_rev = TICKET_STORE.kb_changes_since(_kb_rev)
+    if articles:
+        index_kb_articles(articles)
+    changes, _store_rev = TICKET_STORE.changes_since(_store_rev)
+    created = {}
+    for ticket in changes:
+        if ticket["status"] == "Resolved":
+            ESCALATION_QUEUE.remove_ticket(ticket["id"])
+        elif ticket["status"] == "Escalated":
+            # Escalations raised, breached or assigned by other workers
+            for _, escalation in TICKET_STORE.scan_escalations(ticket_id=ticket["id"]):
+                if escalation.get("status") == "Resolved":
+                    ESCALATION_QUEUE.remove(escalation["id"])
+                elif ESCALATION_QUEUE.get(escalation["id"]) != escalation:
+                    queue_escalation(escalation)
+        known = TICKET_INDEX.docs.get(ticket["id"])
+        if known is None:
+            created[ticket["id"]] = ticket
+        elif known != ticket:
+            old_status = known["status"]
+            TICKET_INDEX.update(ticket)
+            TICKET_STATS.on_status_change(ticket, old_status)
+            invalidate_ticket_caches(ticket, old_status)
+    if created:
+        index_tickets(list(created.values()))
+    return len(changes) + len(articles)
+
+
+async def sync_store_loop():
+    while True:
+        await asyncio.sleep(STORE_SYNC_INTERVAL)
+        try:
+            apply_store_changes()
+        except Exception:
+            logger.exception("Store sync failed")
+
+
 def find_resolution(query: str) -> dict:
     kb_results = search_kb_fn(query)
     if kb_results:
@@ -383,57 +1218,356 @@ def find_resolution(query: str) -> dict:
         return {"found": True, "article": best_match, "confidence": min(0.95, best_match["score"] / 10)}
     return {"found": False, "article": None, "confidence": 0}
 
+# =============================================================================
+# Pagination
+# =============================================================================
+
+NDJSON = "application/x-ndjson"
+
+
+def encode_cursor(seq: int) -> str:
+    return base64.urlsafe_b64encode(str(seq).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[int]:
+    if not cursor:
+        return None
+    try:
+        return int(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def wants_ndjson(request: Request, format: Optional[str]) -> bool:
+    return format == "ndjson" or NDJSON in request.headers.get("accept", "")
+
+
+def ndjson_lines(rows):
+    for _, record in rows:
+        yield json.dumps(record) + "\n"
+
+
+def paginate(rows, limit: Optional[int], ndjson: bool):
+    """Render ``(seq, record)`` pairs as one keyset page or as a streamed NDJSON body.
+
+    JSON pages hold ``limit`` records (default PAGE_SIZE) and carry the cursor
+    for the next page in ``X-Next-Cursor``. NDJSON serializes one record at a
+    time and streams every match unless ``limit`` is given.
+    """
+    if ndjson:
+        return StreamingResponse(ndjson_lines(islice(rows, limit) if limit else rows), media_type=NDJSON)
+    limit = limit or PAGE_SIZE
+    page = list(islice(rows, limit + 1))
+    headers = {}
+    if len(page) > limit:
+        page = page[:limit]
+        headers["X-Next-Cursor"] = encode_cursor(page[-1][0])
+    return JSONResponse([record for _, record in page], headers=headers)
+
+# =============================================================================
+# Bulk Import
+# =============================================================================
+
+class ImportProgressResponse(StreamingResponse):
+    """Streams import events while the upload is still being read.
+
+    StreamingResponse normally listens on ``receive`` for a disconnect, which
+    would swallow the upload's body messages; here ``request.stream()`` owns
+    ``receive`` and raises ClientDisconnect itself.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.stream_response(send)
+
+
+def validation_message(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in err['loc']) or 'row'}: {err['msg']}"
+                     for err in error.errors())
+
+
+def imported_ticket(row: TicketImportRow) -> dict:
+    created = row.created or datetime.now()
+    ticket = {
+        "id": row.id or new_ticket_id(),
+        "subject": row.subject,
+        "priority": row.priority,
+        "status": row.status,
+        "assigned": row.assigned,
+        "created": created.strftime("%Y-%m-%d"),
+        "created_at": created.isoformat(timespec="seconds"),
+        "category": row.category,
+        "updated": "Imported",
+        "requester": row.requester_email,
+        "resolution": row.resolution,
+        "description": row.description,
+    }
+    if row.resolved_at:
+        ticket["resolved_at"] = row.resolved_at.isoformat(timespec="seconds")
+    return ticket
+
+
+async def import_ticket_batch(rows: list) -> list:
+    """Store and index validated ticket rows in one batch; returns ``(row, error)`` for rejects"""
+    tickets, rows_by_id, rejected, seen = [], {}, [], set()
+    for row, item in rows:
+        ticket = imported_ticket(item)
+        while item.id is None and ticket["id"] in seen:
+            ticket["id"] = new_ticket_id()
+        if ticket["id"] in seen or ticket["id"] in TICKET_INDEX.docs:
+            rejected.append((row, f"ticket {ticket['id']} already exists"))
+            continue
+        seen.add(ticket["id"])
+        tickets.append(ticket)
+        rows_by_id[ticket["id"]] = row
+    if tickets:
+        failures = await add_tickets(tickets)
+        rejected += [(rows_by_id[ticket_id], f"ticket {ticket_id} could not be saved: {error}")
+                     for ticket_id, error in failures.items()]
+    return rejected
+
+
+def index_kb_articles(articles: List[dict]) -> None:
+    KB_INDEX.add_many(articles)
+    KB_VECTORS.add_many([(article["id"], kb_text(article)) for article in articles])
+    invalidate_caches({"kb"})
+
+
+async def import_kb_batch(rows: list) -> list:
+    """Store and index articles, replacing any with the same id; returns ``(row, error)`` for rejects"""
+    articles = {}
+    for row, item in rows:
+        articles[item.id] = (row, item.model_dump())
+    TICKET_STORE.put_kb_articles(article for _, article in articles.values())
+    failures = {}
+    try:
+        await TICKET_STORE.commit()
+    except StoreWriteError as e:
+        failures = e.failures
+    index_kb_articles([article for kb_id, (_, article) in articles.items() if kb_id not in failures])
+    return [(articles[kb_id][0], f"article {kb_id} could not be saved: {error}")
+            for kb_id, error in failures.items()]
+
+
+async def refit_kb_vectors() -> None:
+    """Recompute KB vector IDF over the imported corpus, off the event loop"""
+    global KB_VECTORS
+    docs = [(kb_id, kb_text(kb)) for kb_id, kb in KB_INDEX.docs.items()]
+    KB_VECTORS = await asyncio.to_thread(VectorIndex(VECTOR_DIM).fit, docs)
+    # Articles imported concurrently while the matrix was rebuilt
+    KB_VECTORS.add_many([(kb_id, kb_text(kb)) for kb_id, kb in KB_INDEX.docs.items() if kb_id not in KB_VECTORS])
+    invalidate_caches({"kb"})
+
+
+async def import_events(rows, model, apply_batch, finish=None):
+    """Validate and apply parsed rows batch by batch.
+
+    Yields an ``error`` event per rejected row, a ``progress`` event after
+    each batch and a final ``summary``; bad rows never stop the import.
+    """
+    counts = {"rows": 0, "imported": 0, "failed": 0}
+    started = time.monotonic()
+    async for batch in batched(rows, IMPORT_BATCH_SIZE):
+        valid = []
+        for row, record, error in batch:
+            counts["rows"] += 1
+            if error is None:
+                try:
+                    valid.append((row, model.model_validate(record)))
+                    continue
+                except ValidationError as e:
+                    error = validation_message(e)
+            counts["failed"] += 1
+            yield {"type": "error", "row": row, "error": error}
+        rejected = await apply_batch(valid) if valid else []
+        for row, error in rejected:
+            yield {"type": "error", "row": row, "error": error}
+        counts["failed"] += len(rejected)
+        counts["imported"] += len(valid) - len(rejected)
+        yield {"type": "progress", **counts, "elapsed_seconds": round(time.monotonic() - started, 2)}
+    if finish and counts["imported"]:
+        await finish()
+    yield {"type": "summary", **counts, "elapsed_seconds": round(time.monotonic() - started, 2)}
+
+
+async def import_response(request: Request, model, aliases: dict, apply_batch, finish=None):
+    """Stream an NDJSON or CSV upload into ``apply_batch``.
+
+    With ``Accept: application/x-ndjson`` the error, progress and summary
+    events stream back as the upload is processed; otherwise the summary is
+    returned once the import finishes, with the first MAX_IMPORT_ERRORS row errors.
+    """
+    rows = parse_upload(request.stream(), request.headers.get("content-type", ""), aliases)
+    if rows is None:
+        raise HTTPException(status_code=415, detail="Send NDJSON (application/x-ndjson) or CSV (text/csv)")
+    events = import_events(rows, model, apply_batch, finish)
+    if wants_ndjson(request, None):
+        return ImportProgressResponse((json.dumps(event) + "\n" async for event in events), media_type=NDJSON)
+    errors, summary = [], None
+    async for event in events:
+        if event["type"] == "error" and len(errors) < MAX_IMPORT_ERRORS:
+            errors.append({"row": event["row"], "error": event["error"]})
+        elif event["type"] == "summary":
+            summary = {k: v for k, v in event.items() if k != "type"}
+    return {**summary, "errors": errors, "errors_truncated": summary["failed"] > len(errors)}
+
 # =============================================================================
 # API Endpoints
 # =============================================================================
 
 @app.post("/chat")
-async def chat(request: ChatRequest):
-    """Main chat endpoint - Claude-powered with tool use"""
-    return StreamingResponse(
-        generate_claude_response(request.message, request.role),
-        media_type="text/event-stream"
-    )
+async def chat(request: ChatRequest, http_request: Request):
+    """Main chat endpoint - Claude-powered with tool use.
+
+    Cached outcomes are replayed directly. Otherwise concurrent chats with
+    the same normalized message join one in-flight computation, and only new
+    computations take an admission slot (admins ahead of users); a full queue
+    is rejected with 429. Follow-ups in a session depend on its history, so
+    they skip the cache and coalescing; a session's first turn does not.
+    """
+    session = None
+    if request.session_id:
+        session = SESSIONS.get((request.role, request.session_id))
+        if session.turns or session.summary or session.lock.locked():
+            slot = reserve_chat_slot(request.role)
+            events = session_chat_response(request.message, request.role, session)
+            return sse_response(admitted(slot, events), http_request, "session")
+
+    def opening(events, calls):
+        return events if session is None else first_turn_response(request.message, session, events, calls)
+
+    cached = CHAT_CACHE.get(chat_cache_key(request.message, request.role))
+    if cached is not MISSING:
+        events, calls = cached
+        return sse_response(opening(replay_events(events), calls), http_request, "cached")
+
+    key = chat_cache_key(request.message, request.role)
+    flight = CHAT_FLIGHTS.join(key)
+    path = "coalesced"
+    if flight is None:
+        slot = reserve_chat_slot(request.role)
+        calls = []
+        flight = CHAT_FLIGHTS.start(
+            key, lambda: admitted(slot, record_chat_response(request.message, request.role, calls)), context=calls)
+        path = "generated"
+    return sse_response(opening(flight.subscribe(), flight.context), http_request, path)
 
 
 @app.post("/tickets")
 async def create_ticket_endpoint(request: TicketCreateRequest):
-    ticket = create_ticket(request)
-    resolution = find_resolution(f"{request.subject} {request.description}")
+    try:
+        ticket = await create_ticket(request)
+    except StoreWriteError as e:
+        raise HTTPException(status_code=503, detail=f"Ticket could not be saved: {e}")
+    text = f"{request.subject} {request.description}"
+    # Both score the whole corpus; keep that off the event loop
+    resolution, duplicates = await asyncio.gather(
+        asyncio.to_thread(find_resolution, text),
+        asyncio.to_thread(find_duplicates, text, exclude_id=ticket["id"]),
+    )
     return {
         "ticket": ticket,
         "suggested_resolution": resolution["article"] if resolution["found"] else None,
+        "possible_duplicates": duplicates,
         "message": f"Ticket {ticket['id']} created successfully."
     }
 
 
+@app.post("/tickets/import")
+async def import_tickets_endpoint(request: Request):
+    """Bulk-load tickets from NDJSON or CSV (ServiceNow export columns accepted)"""
+    return await import_response(request, TicketImportRow, TICKET_IMPORT_ALIASES, import_ticket_batch)
+
+
+@app.post("/kb/import")
+async def import_kb_endpoint(request: Request):
+    """Bulk-load knowledge base articles from NDJSON or CSV; existing ids are replaced"""
+    return await import_response(request, KBArticleImport, KB_IMPORT_ALIASES, import_kb_batch, refit_kb_vectors)
+
+
 @app.post("/escalate")
 async def escalate_endpoint(request: EscalationRequest):
-    escalation = escalate_ticket(request.ticket_id, request.reason)
+    try:
+        escalation = await escalate_ticket(request.ticket_id, request.reason)
+    except StoreWriteError as e:
+        raise HTTPException(status_code=503, detail=f"Escalation could not be saved: {e}")
     return {
         "escalation": escalation,
         "message": f"Ticket {request.ticket_id} has been escalated. An admin will review shortly."
     }
 
 
+@app.post("/tickets/{ticket_id}/resolve")
+async def resolve_ticket_endpoint(ticket_id: str, request: TicketResolveRequest):
+    try:
+        ticket = await set_ticket_status(ticket_id, "Resolved", resolution=request.resolution)
+    except StoreWriteError as e:
+        raise HTTPException(status_code=503, detail=f"Ticket could not be saved: {e}")
+    if ticket is None:
+        raise HTTPException(status_code=404, detail="Ticket not found")
+    return {"ticket": ticket, "message": f"Ticket {ticket_id} has been resolved."}
+
+
 @app.get("/tickets")
-async def list_tickets(status: str = None):
-    if status:
-        return [t for t in TICKETS if t["status"].lower() == status.lower()]
-    return TICKETS
+async def list_tickets(
+    request: Request,
+    status: str = None,
+    priority: str = None,
+    category: str = None,
+    created_from: Optional[date] = None,
+    created_to: Optional[date] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    format: Optional[str] = Query(None, pattern="^(json|ndjson)$"),
+):
+    """Newest-first tickets, filtered in the store and paged by keyset cursor"""
+    rows = TICKET_STORE.scan(
+        status=status,
+        priority=priority,
+        category=category,
+        created_from=created_from.isoformat() if created_from else None,
+        created_to=created_to.isoformat() if created_to else None,
+        before=decode_cursor(cursor),
+    )
+    return paginate(rows, limit, wants_ndjson(request, format))
 
 
 @app.get("/tickets/{ticket_id}")
 async def get_ticket(ticket_id: str):
-    for t in TICKETS:
-        if t["id"] == ticket_id:
-            return t
+    ticket = TICKET_STORE.get(ticket_id)
+    if ticket:
+        return ticket
     raise HTTPException(status_code=404, detail="Ticket not found")
 
 
 @app.get("/escalations")
-async def list_escalations():
-    return ESCALATIONS
+async def list_escalations(
+    request: Request,
+    status: str = None,
+    created_from: Optional[date] = None,
+    created_to: Optional[date] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    format: Optional[str] = Query(None, pattern="^(json|ndjson)$"),
+):
+    """Oldest-first escalations, paged by keyset cursor"""
+    rows = TICKET_STORE.scan_escalations(
+        status=status,
+        created_from=created_from.isoformat() if created_from else None,
+        created_to=created_to.isoformat() if created_to else None,
+        after=decode_cursor(cursor),
+    )
+    return paginate(rows, limit, wants_ndjson(request, format))
+
+
+@app.get("/escalations/queue")
+async def escalation_queue(limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE)):
+    """The ``limit`` most urgent open escalations as NDJSON, read lazily off the SLA queue"""
+    async def lines():
+        for position, escalation in enumerate(ESCALATION_QUEUE.top(limit), 1):
+            yield json.dumps({**escalation, "position": position}) + "\n"
+            if position % 100 == 0:
+                await asyncio.sleep(0)
+    return StreamingResponse(lines(), media_type=NDJSON)
 
 
 @app.get("/stats")
@@ -443,7 +1577,45 @@ async def get_stats():
 
 @app.get("/health")
 async def health():
-    return {"status": "ok", "service": "enterprise-service-desk", "version": "2.0.0", "model": MODEL}
+    return {"status": "ok", "service": "enterprise-service-desk", "version": "2.0.0", "model": MODEL,
+            "llm_usage": usage_summary(LLM_USAGE), "router": ROUTER.stats(),
+            "cache": {"tools": TOOL_CACHE.stats(), "chat": CHAT_CACHE.stats()},
+            "admission": {**CHAT_ADMISSION.stats(), **CHAT_FLIGHTS.stats()},
+            "sessions": SESSIONS.stats(), "escalations": ESCALATION_QUEUE.stats()}
+
+
+# Counters the router, caches, admission controller, sessions and stats already keep, read at scrape time
+METRICS.collected("servicedesk_router_decisions_total", "Intent router decisions", "counter", ["decision"],
+                  lambda: [((decision,), n) for decision, n in ROUTER.decisions.items()])
+METRICS.collected("servicedesk_cache_events_total", "Cache lookups and removals", "counter", ["cache", "event"],
+                  lambda: [((cache_name, event), stats[event])
+                           for cache_name, stats in (("tools", TOOL_CACHE.stats()), ("chat", CHAT_CACHE.stats()))
+                           for event in ("hits", "misses", "evictions", "expirations", "invalidations",
+                                         "stale_writes")])
+METRICS.collected("servicedesk_cache_entries", "Entries held per cache", "gauge", ["cache"],
+                  lambda: [(("tools",), len(TOOL_CACHE)), (("chat",), len(CHAT_CACHE))])
+METRICS.collected("servicedesk_chat_admission_total", "Chat admission outcomes", "counter", ["outcome"],
+                  lambda: [(("admitted",), CHAT_ADMISSION.admitted), (("rejected",), CHAT_ADMISSION.rejected),
+                           (("coalesced",), CHAT_FLIGHTS.coalesced)])
+METRICS.collected("servicedesk_chat_slots", "Chats generating or waiting for a slot", "gauge", ["state"],
+                  lambda: [(("active",), CHAT_ADMISSION.active), (("queued",), CHAT_ADMISSION.queued)])
+METRICS.collected("servicedesk_sessions", "Live chat sessions", "gauge", [], lambda: [((), len(SESSIONS))])
+METRICS.collected("servicedesk_session_bytes", "Estimated memory held by chat sessions", "gauge", [],
+                  lambda: [((), SESSIONS.bytes)])
+METRICS.collected("servicedesk_open_escalations", "Escalations in the SLA queue", "gauge", ["state"],
+                  lambda: [(("unassigned",), ESCALATION_QUEUE.unassigned),
+                           (("assigned",), len(ESCALATION_QUEUE) - ESCALATION_QUEUE.unassigned),
+                           (("breached",), ESCALATION_QUEUE.breached_open)])
+METRICS.collected("servicedesk_escalation_assignments_total", "Escalations auto-assigned by the worker", "counter",
+                  [], lambda: [((), ESCALATION_QUEUE.assigned_total)])
+METRICS.collected("servicedesk_open_tickets", "Open tickets by priority", "gauge", ["priority"],
+                  lambda: [((priority,), n) for priority, n in TICKET_STATS.open_by_priority.items()])
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint (per worker process)"""
+    return Response(METRICS.render(), media_type="text/plain; version=0.0.4")
 
 
 if __name__ == "__main__":
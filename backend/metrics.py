@@ -0,0 +1,220 @@
+"""Prometheus counters and histograms, plus opt-in per-request stage traces"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Stages of the current request, when it asked for a trace
+_trace: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("trace", default=None)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = list(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram; ``time()`` observes a block or function and
+    also records it as a stage of the current request's trace"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last is +Inf), sum, count]
+        self._values: Dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, stage: str = None, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self.observe(elapsed, **labels)
+            if stage:
+                record_stage(stage, elapsed)
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = [(key, list(entry[0]), entry[1], entry[2]) for key, entry in self._values.items()]
+        bounds = self.buckets + (float("inf"),)
+        for key, counts, total, count in values:
+            cumulative = 0
+            for bound, n in zip(bounds, counts):
+                cumulative += n
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {count}"
+
+
+class Collected(_Metric):
+    """Samples read at scrape time from counters the application already keeps"""
+
+    def __init__(self, name: str, help: str, kind: str, labelnames: Sequence[str],
+                 collect: Callable[[], Iterable[Tuple[tuple, float]]]):
+        super().__init__(name, help, labelnames)
+        self.kind = kind
+        self.collect = collect
+
+    def samples(self) -> Iterable[str]:
+        for key, value in self.collect():
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def collected(self, name: str, help: str, kind: str, labelnames: Sequence[str],
+                  collect: Callable[[], Iterable[Tuple[tuple, float]]]) -> Collected:
+        return self.register(Collected(name, help, kind, labelnames, collect))
+
+    def render(self) -> str:
+        """Prometheus text exposition format (0.0.4)"""
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+# -- traces -------------------------------------------------------------------
+
+def record_stage(stage: str, seconds: float) -> None:
+    stages = _trace.get()
+    if stages is not None:
+        stages.append((stage, seconds))
+
+
+def current_trace() -> Optional[List[Tuple[str, float]]]:
+    return _trace.get()
+
+
+def server_timing(stages: Iterable[Tuple[str, float]]) -> str:
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in stages)
+
+
+class MetricsMiddleware:
+    """Times every HTTP request by method, route template and status.
+
+    A request carrying ``trace_header`` gets a trace: each instrumented
+    stage it runs is recorded, and the stages finished by the time the
+    response starts are returned in a ``Server-Timing`` header. Streaming
+    responses can read the rest with ``current_trace()``.
+    """
+
+    def __init__(self, app, histogram: Histogram, trace_header: str = "x-trace", tracing: bool = True):
+        self.app = app
+        self.histogram = histogram
+        self.trace_header = trace_header.lower().encode()
+        self.tracing = tracing
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500
+        stages = token = None
+        if self.tracing and any(k == self.trace_header and v not in (b"", b"0", b"false")
+                                for k, v in scope.get("headers", ())):
+            stages = []
+            token = _trace.set(stages)
+
+        async def send_wrapper(message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if stages is not None:
+                    timing = server_timing(stages + [("app", time.perf_counter() - started)])
+                    message = {**message, "headers": [*message.get("headers", []),
+                                                      (b"server-timing", timing.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if token is not None:
+                _trace.reset(token)
+            route = scope.get("route")
+            self.histogram.observe(time.perf_counter() - started, method=scope["method"],
+                                   route=getattr(route, "path", "unmatched"), status=status)
@@ -0,0 +1,114 @@
+"""Deterministic intent router for chat messages that don't need the LLM to pick tools"""
+import re
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+TICKET_ID_RE = re.compile(r"\bINC\d{7}\b", re.IGNORECASE)
+STATS_RE = re.compile(r"\b(stats|statistics|metrics|dashboard|kpis?|summary|overview)\b", re.IGNORECASE)
+LIST_RE = re.compile(r"\b(show|list|display|what|which|any|get|find)\b.*\b(tickets?|incidents?|issues?)\b", re.IGNORECASE)
+HOWTO_RE = re.compile(
+    r"\b(how (do|can|to)|reset|unlock|can'?t|cannot|unable|locked out|"
+    r"not (working|syncing|connecting|loading))\b",
+    re.IGNORECASE,
+)
+PRIORITY_RE = re.compile(r"\b(p[123]|critical|high|medium)\b", re.IGNORECASE)
+STATUS_RE = re.compile(r"\b(open|in progress|resolved|escalated)\b", re.IGNORECASE)
+
+PRIORITY_WORDS = {"critical": "P1", "high": "P2", "medium": "P3"}
+SHORT_MESSAGE_WORDS = 12
+
+
+class Route(NamedTuple):
+    intent: str
+    calls: List[Tuple[str, dict]]
+    confidence: float
+
+
+class IntentRouter:
+    """Maps obvious intents to tool calls with a rule-based confidence.
+
+    A route is taken only when its confidence reaches the threshold for its
+    intent (``thresholds`` overrides ``min_confidence`` per intent). Every
+    decision is counted in ``decisions`` so routing can be tuned from metrics.
+    """
+
+    def __init__(self, min_confidence: float = 0.85, thresholds: Dict[str, float] = None, enabled: bool = True):
+        self.min_confidence = min_confidence
+        self.thresholds = thresholds or {}
+        self.enabled = enabled
+        self.decisions: Counter = Counter()
+
+    def classify(self, message: str) -> Optional[Route]:
+        """Best-matching route regardless of threshold, or None"""
+        words = len(message.split())
+        short = words <= SHORT_MESSAGE_WORDS
+
+        ticket_id = TICKET_ID_RE.search(message)
+        if ticket_id:
+            return Route("ticket_status", [("get_ticket", {"ticket_id": ticket_id.group(0).upper()})],
+                         0.98 if short else 0.75)
+
+        if STATS_RE.search(message) and not HOWTO_RE.search(message):
+            return Route("ticket_stats", [("get_ticket_statistics", {})], 0.95 if short else 0.75)
+
+        if LIST_RE.search(message):
+            tool_input = {"query": message}
+            priority = PRIORITY_RE.search(message)
+            if priority:
+                word = priority.group(0).lower()
+                tool_input["priority_filter"] = PRIORITY_WORDS.get(word, word.upper())
+            status = STATUS_RE.search(message)
+            if status:
+                tool_input["status_filter"] = status.group(0).title()
+            filtered = len(tool_input) > 1
+            return Route("list_tickets", [("search_tickets", tool_input)],
+                         (0.92 if filtered else 0.86) if short else 0.7)
+
+        if HOWTO_RE.search(message):
+            return Route("kb_lookup", [("search_knowledge_base", {"query": message})], 0.88 if short else 0.7)
+
+        return None
+
+    def route(self, message: str) -> Optional[Route]:
+        """Route to take for ``message``, or None to fall back to the LLM tool loop"""
+        if not self.enabled:
+            return None
+        route = self.classify(message)
+        if route is None:
+            self.decisions["fallback:no_match"] += 1
+            return None
+        if route.confidence < self.thresholds.get(route.intent, self.min_confidence):
+            self.decisions[f"fallback:low_confidence:{route.intent}"] += 1
+            return None
+        self.decisions[f"routed:{route.intent}"] += 1
+        return route
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "min_confidence": self.min_confidence,
+            "thresholds": dict(self.thresholds),
+            "decisions": dict(self.decisions),
+        }
+
+
+def render_template(intent: str, results: list) -> Optional[str]:
+    """Canned answer for a routed intent, or None when the results need the LLM to explain them"""
+    result = results[0] if results else None
+    if not result or (isinstance(result, dict) and "error" in result):
+        return None
+    if intent == "ticket_status":
+        return (f"**{result['id']}** ({result['priority']}) is **{result['status']}**, "
+                f"assigned to {result['assigned']}. Last updated {result['updated']}.")
+    if intent == "ticket_stats":
+        return (f"There are **{result['total_open']}** open incidents: **{result['p1_count']}** P1 and "
+                f"**{result['p2_count']}** P2. Average resolution time is **{result['avg_resolution_time']}**, "
+                f"week over week **{result['trend']}**.")
+    if intent == "list_tickets":
+        top = result[0]
+        plural = "s" if len(result) != 1 else ""
+        return f"Found **{len(result)}** matching ticket{plural}. Top result: **{top['id']}**: {top['subject']}."
+    if intent == "kb_lookup":
+        return (f"**{result[0]['title']}** should help. Try the resolution steps below, and if that "
+                f"doesn't fix it I can create a support ticket for you.")
+    return None
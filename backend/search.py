@@ -0,0 +1,263 @@
+"""Inverted-index search with BM25 ranking for tickets and KB articles"""
+import heapq
+import math
+import re
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[./-][a-z0-9]+)*")
+
+STOPWORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from",
+    "how", "i", "in", "is", "it", "me", "my", "no", "not", "of", "on", "or", "the", "this",
+    "to", "what", "with", "why", "you", "your",
+})
+
+# BM25 tuning constants (Robertson/Sparck Jones defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def stem(token: str) -> str:
+    """Light suffix stripping so 'orders'/'failing' match 'order'/'fail'"""
+    if len(token) > 5 and token.endswith("ing"):
+        return token[:-3]
+    if len(token) > 4 and token.endswith("ed"):
+        return token[:-2]
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase, split on non-alphanumerics, drop stopwords and stem"""
+    return [stem(t) for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+class InvertedIndex:
+    """BM25F-style inverted index over weighted document fields.
+
+    Each field contributes ``weight * tf`` to a term's frequency in a document
+    and ``weight * len`` to the document length, so a title hit counts more than
+    an excerpt hit. Postings, document lengths and document frequencies are
+    maintained incrementally by ``add``/``update``/``remove``; nothing is
+    recomputed at query time except the per-term IDF.
+
+    ``facets`` names fields (e.g. status) whose lowercased values get a set of
+    document keys each, so filtered queries only score matching documents.
+    """
+
+    def __init__(self, fields: Dict[str, float], key: str = "id", facets: Sequence[str] = ()):
+        self.fields = fields
+        self.key = key
+        self.docs: Dict[str, dict] = {}
+        self.postings: Dict[str, Dict[str, float]] = defaultdict(dict)
+        self.doc_terms: Dict[str, Dict[str, float]] = {}
+        self.doc_len: Dict[str, float] = {}
+        self.total_len = 0.0
+        # Per-term largest tf and shortest document, for score upper bounds; only
+        # widened on add, so they stay valid (if looser) after removals
+        self.max_tf: Dict[str, float] = {}
+        self.min_len: Dict[str, float] = {}
+        self.facets: Dict[str, Dict[str, Set[str]]] = {field: {} for field in facets}
+        self.doc_facets: Dict[str, Dict[str, str]] = {}
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self.docs
+
+    def _field_tokens(self, doc: dict, field: str) -> List[str]:
+        value = doc.get(field)
+        if not value:
+            return []
+        if isinstance(value, (list, tuple)):
+            return [tok for item in value for tok in tokenize(str(item))]
+        return tokenize(str(value))
+
+    def _term_weights(self, doc: dict) -> Tuple[Dict[str, float], float]:
+        weights: Dict[str, float] = defaultdict(float)
+        length = 0.0
+        for field, weight in self.fields.items():
+            tokens = self._field_tokens(doc, field)
+            length += weight * len(tokens)
+            for tok in tokens:
+                weights[tok] += weight
+        return weights, length
+
+    def add(self, doc: dict) -> None:
+        """Index a document, replacing any previous version with the same key"""
+        doc_id = doc[self.key]
+        if doc_id in self.docs:
+            self.remove(doc_id)
+        weights, length = self._term_weights(doc)
+        self.docs[doc_id] = doc
+        self.doc_terms[doc_id] = weights
+        self.doc_len[doc_id] = length
+        self.total_len += length
+        for term, tf in weights.items():
+            self.postings[term][doc_id] = tf
+            if tf > self.max_tf.get(term, 0.0):
+                self.max_tf[term] = tf
+            if length < self.min_len.get(term, math.inf):
+                self.min_len[term] = length
+        self._set_facets(doc_id, doc)
+
+    def add_many(self, docs: Iterable[dict]) -> None:
+        for doc in docs:
+            self.add(doc)
+
+    def update(self, doc: dict) -> None:
+        """Re-index a document in place; a no-op when its indexed text is unchanged"""
+        doc_id = doc[self.key]
+        weights, _ = self._term_weights(doc)
+        if self.doc_terms.get(doc_id) == weights:
+            self.docs[doc_id] = doc
+            self._set_facets(doc_id, doc)
+            return
+        self.add(doc)
+
+    def remove(self, doc_id: str) -> None:
+        if doc_id not in self.docs:
+            return
+        for term in self.doc_terms.pop(doc_id):
+            posting = self.postings[term]
+            posting.pop(doc_id, None)
+            if not posting:
+                del self.postings[term]
+        self.total_len -= self.doc_len.pop(doc_id)
+        for field, value in self.doc_facets.pop(doc_id, {}).items():
+            self.facets[field][value].discard(doc_id)
+        del self.docs[doc_id]
+
+    def _set_facets(self, doc_id: str, doc: dict) -> None:
+        if not self.facets:
+            return
+        current = self.doc_facets.setdefault(doc_id, {})
+        for field, buckets in self.facets.items():
+            value = str(doc.get(field) or "").lower()
+            old = current.get(field)
+            if old == value:
+                continue
+            if old is not None:
+                buckets[old].discard(doc_id)
+            buckets.setdefault(value, set()).add(doc_id)
+            current[field] = value
+
+    def facet(self, field: str, value: str) -> Set[str]:
+        """Keys of the documents whose ``field`` equals ``value`` (case-insensitive)"""
+        return self.facets[field].get(str(value).lower(), set())
+
+    def matches(self, doc_id: str, terms: Iterable[str]) -> bool:
+        """Whether a document contains any of the (tokenized) query ``terms``, i.e. would get a score"""
+        doc_terms = self.doc_terms.get(doc_id, {})
+        return any(term in doc_terms for term in terms)
+
+    def idf(self, term: str) -> float:
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (len(self.docs) - df + 0.5) / (df + 0.5))
+
+    def scores(self, query: str) -> Dict[str, float]:
+        """BM25 score for every document containing at least one query term"""
+        n = len(self.docs)
+        if not n:
+            return {}
+        avgdl = self.total_len / n or 1.0
+        acc: Dict[str, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = self.idf(term)
+            # Snapshot: tools run on executor threads while writers add documents
+            for doc_id, tf in tuple(posting.items()):
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len[doc_id] / avgdl)
+                acc[doc_id] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return acc
+
+    def top(self, query: str, k: int, within: Sequence[Set[str]] = (),
+            order_by: str = None) -> Tuple[List[Tuple[str, float]], float]:
+        """The ``k`` best (key, score) pairs among documents in every ``within``
+        set, plus the best score of any such document.
+
+        With ``order_by`` (a facet), documents rank by that facet's value
+        first and by score second, e.g. P1 hits before stronger P2 hits.
+
+        Term-at-a-time MaxScore: query terms are taken highest upper bound
+        first, and each new document is scored in full from its term weights.
+        Once the top k all sit in the first facet value and the bounds of the
+        terms left add up to no more than the k-th best score, no unseen
+        document can make the cut (or beat the best score), so the remaining
+        postings are never walked. Filters apply before scoring, by walking
+        the filter set instead of a posting when it is smaller.
+        """
+        n = len(self.docs)
+        if not n or k <= 0:
+            return [], 0.0
+        avgdl = self.total_len / n or 1.0
+        lo, per_len = BM25_K1 * (1 - BM25_B), BM25_K1 * BM25_B / avgdl
+        factors, bounds = {}, {}
+        for term in set(tokenize(query)):
+            if self.postings.get(term):
+                factors[term] = self.idf(term) * (BM25_K1 + 1)
+                tf = self.max_tf[term]
+                bounds[term] = factors[term] * tf / (tf + lo + per_len * self.min_len[term])
+        factor_items = tuple(factors.items())
+        remaining = sum(bounds.values())
+        within = sorted(within, key=len)
+        ranks, doc_facets, first_rank = {}, self.doc_facets, 0
+        if order_by:
+            ranks = {value: i for i, value in enumerate(sorted(self.facets[order_by]))}
+            first_rank = min((ranks[value] for value, docs in self.facets[order_by].items() if docs), default=0)
+        doc_terms, doc_len = self.doc_terms, self.doc_len
+        # Worst of the current top k on top: (-rank, score, key)
+        heap: List[Tuple[int, float, str]] = []
+        best = 0.0
+        seen: Set[str] = set()
+        for term in sorted(bounds, key=bounds.get, reverse=True):
+            if len(heap) == k and -heap[0][0] == first_rank and remaining <= heap[0][1]:
+                break
+            remaining -= bounds[term]
+            posting = self.postings.get(term, {})
+            # Snapshots: tools run on executor threads while writers add documents
+            if within and len(within[0]) < len(posting):
+                candidates = [d for d in tuple(within[0]) if d in posting]
+                rest = within[1:]
+            else:
+                candidates = tuple(posting)
+                rest = within
+            for doc_id in candidates:
+                if doc_id in seen:
+                    continue
+                seen.add(doc_id)
+                if rest and not all(doc_id in s for s in rest):
+                    continue
+                terms_of_doc = doc_terms.get(doc_id)
+                if terms_of_doc is None:
+                    continue
+                norm = lo + per_len * doc_len[doc_id]
+                score = 0.0
+                for t, factor in factor_items:
+                    tf = terms_of_doc.get(t)
+                    if tf:
+                        score += factor * tf / (tf + norm)
+                if score > best:
+                    best = score
+                item = (-ranks.get(doc_facets[doc_id][order_by], 0) if order_by else 0, score, doc_id)
+                if len(heap) < k:
+                    heapq.heappush(heap, item)
+                elif item[:2] > heap[0][:2]:
+                    heapq.heapreplace(heap, item)
+        return [(doc_id, score) for _, score, doc_id in sorted(heap, reverse=True)], best
+
+    def search(self, query: str, k: int = 10,
+               predicate: Optional[Callable[[dict], bool]] = None) -> List[Tuple[dict, float]]:
+        """Top-k (document, score) pairs, highest score first"""
+        scored = self.scores(query)
+        if predicate:
+            scored = {d: s for d, s in scored.items() if predicate(self.docs[d])}
+        top = heapq.nlargest(k, scored.items(), key=lambda item: item[1])
+        return [(self.docs[doc_id], score) for doc_id, score in top]
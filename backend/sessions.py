@@ -0,0 +1,245 @@
+"""Memory-bounded multi-turn chat sessions"""
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Tuple
+
+CHARS_PER_TOKEN = 4
+SUMMARY_MESSAGE_CHARS = 160
+SUMMARY_ANSWER_CHARS = 240
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+class ResultStore:
+    """Tool results as compact JSON, content-addressed and reference-counted.
+
+    Sessions keep only the reference, so a result shared by many turns or
+    sessions (statistics, a popular KB search) is held once.
+    """
+
+    def __init__(self):
+        self._blobs: Dict[str, list] = {}
+        self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._blobs)
+
+    def put(self, result) -> str:
+        data = json.dumps(result, sort_keys=True, separators=(",", ":"))
+        ref = hashlib.blake2b(data.encode(), digest_size=12).hexdigest()
+        entry = self._blobs.get(ref)
+        if entry is None:
+            self._blobs[ref] = [data, 1]
+            self.bytes += len(data)
+        else:
+            entry[1] += 1
+        return ref
+
+    def get(self, ref: str) -> str:
+        return self._blobs[ref][0]
+
+    def release(self, ref: str) -> None:
+        entry = self._blobs.get(ref)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if entry[1] <= 0:
+            del self._blobs[ref]
+            self.bytes -= len(entry[0])
+
+
+class Turn:
+    __slots__ = ("message", "calls", "answer", "tokens", "bytes")
+
+    def __init__(self, message: str, calls: List[Tuple[str, str, str]], answer: str):
+        self.message = message
+        # (tool name, input as compact JSON, result reference)
+        self.calls = calls
+        self.answer = answer
+        self.tokens = 0
+        self.bytes = 0
+
+
+class Session:
+    __slots__ = ("key", "turns", "summary", "tokens", "bytes", "last_used", "lock")
+
+    def __init__(self, key: Hashable, now: float):
+        self.key = key
+        self.turns: List[Turn] = []
+        self.summary = ""
+        self.tokens = 0
+        self.bytes = 0
+        self.last_used = now
+        # Serializes turns of one conversation, so each sees the previous answer
+        self.lock = asyncio.Lock()
+
+
+class SessionStore:
+    """Conversation histories with a per-session token budget and global bounds.
+
+    Each session's history is kept within ``token_budget`` (estimated at
+    four characters per token): the oldest turns first lose their tool
+    results, then are folded into a short extractive summary. Sessions idle
+    for ``ttl`` seconds expire, and the least recently used are evicted
+    whenever there are more than ``max_sessions`` or the histories and
+    results together exceed ``max_bytes``.
+    """
+
+    def __init__(self, token_budget: int = 4000, ttl: float = 1800.0, max_sessions: int = 10000,
+                 max_bytes: int = 64 * 1024 * 1024, clock: Callable[[], float] = time.monotonic):
+        self.token_budget = token_budget
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.results = ResultStore()
+        self._sessions: "OrderedDict[Hashable, Session]" = OrderedDict()
+        self.history_bytes = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.trimmed = 0
+        self.summarized = 0
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    @property
+    def bytes(self) -> int:
+        return self.history_bytes + self.results.bytes
+
+    # -- lifecycle ------------------------------------------------------------
+
+    def get(self, key: Hashable) -> Session:
+        """The live session for ``key``, started fresh if it is new or expired"""
+        now = self.clock()
+        self._expire(now)
+        session = self._sessions.get(key)
+        if session is None:
+            session = self._sessions[key] = Session(key, now)
+            self._evict()
+        else:
+            self._sessions.move_to_end(key)
+        session.last_used = now
+        return session
+
+    def _drop(self, session: Session) -> None:
+        del self._sessions[session.key]
+        self.history_bytes -= session.bytes
+        for turn in session.turns:
+            self._release(turn)
+
+    def _release(self, turn: Turn) -> None:
+        for _, _, ref in turn.calls:
+            self.results.release(ref)
+
+    def _expire(self, now: float) -> None:
+        # LRU order is last-use order, so expired sessions sit at the front
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_used < self.ttl:
+                break
+            self._drop(session)
+            self.expirations += 1
+
+    def _evict(self) -> None:
+        while len(self._sessions) > 1 and (len(self._sessions) > self.max_sessions or self.bytes > self.max_bytes):
+            self._drop(next(iter(self._sessions.values())))
+            self.evictions += 1
+
+    # -- history --------------------------------------------------------------
+
+    def record(self, session: Session, message: str, calls: List[Tuple[str, dict, object]], answer: str) -> None:
+        """Append a finished turn; ``calls`` are ``(tool name, input, result)``"""
+        if self._sessions.get(session.key) is not session:
+            return  # evicted or expired while the turn was running
+        turn = Turn(message, [(name, json.dumps(tool_input, sort_keys=True, separators=(",", ":")),
+                               self.results.put(result)) for name, tool_input, result in calls], answer)
+        self._measure(turn)
+        session.turns.append(turn)
+        session.last_used = self.clock()
+        self._fit_budget(session)
+        self._remeasure(session)
+        self._evict()
+
+    def _measure(self, turn: Turn) -> None:
+        text = len(turn.message) + len(turn.answer)
+        call_chars = sum(len(name) + len(tool_input) for name, tool_input, _ in turn.calls)
+        result_chars = sum(len(self.results.get(ref)) for _, _, ref in turn.calls)
+        turn.tokens = (text + call_chars + result_chars) // CHARS_PER_TOKEN + 1
+        # Results are counted once, in the shared store
+        turn.bytes = text + call_chars + len(turn.calls) * 24
+
+    def _remeasure(self, session: Session) -> None:
+        self.history_bytes -= session.bytes
+        session.tokens = estimate_tokens(session.summary) + sum(turn.tokens for turn in session.turns)
+        session.bytes = len(session.summary) + sum(turn.bytes for turn in session.turns)
+        self.history_bytes += session.bytes
+
+    def _fit_budget(self, session: Session) -> None:
+        """Shed the oldest tool results, then fold the oldest turns into the summary"""
+        def total() -> int:
+            return estimate_tokens(session.summary) + sum(turn.tokens for turn in session.turns)
+
+        for turn in session.turns[:-1]:
+            if total() <= self.token_budget:
+                return
+            if turn.calls:
+                self._release(turn)
+                turn.calls = []
+                self._measure(turn)
+                self.trimmed += 1
+        while len(session.turns) > 1 and total() > self.token_budget:
+            turn = session.turns.pop(0)
+            self._release(turn)
+            # One line per turn, so trimming the summary drops whole turns
+            message = " ".join(turn.message.split())[:SUMMARY_MESSAGE_CHARS]
+            answer = " ".join(turn.answer.split())[:SUMMARY_ANSWER_CHARS]
+            line = f"- User: {message} / Assistant: {answer}"
+            session.summary = f"{session.summary}\n{line}".strip()
+            # The summary itself gets at most a quarter of the budget; the oldest lines go first
+            max_chars = self.token_budget * CHARS_PER_TOKEN // 4
+            if len(session.summary) > max_chars:
+                session.summary = session.summary[-max_chars:].split("\n", 1)[-1]
+            self.summarized += 1
+
+    def messages(self, session: Session, message: str) -> List[dict]:
+        """Claude ``messages`` for the session's history followed by ``message``"""
+        out: List[dict] = []
+        for t, turn in enumerate(session.turns):
+            out.append({"role": "user", "content": turn.message})
+            if turn.calls:
+                # Fresh IDs: the same tool_use_id may have been used by several turns
+                ids = [f"toolu_hist_{t}_{i}" for i in range(len(turn.calls))]
+                out.append({"role": "assistant", "content": [
+                    {"type": "tool_use", "id": tool_use_id, "name": name, "input": json.loads(tool_input)}
+                    for tool_use_id, (name, tool_input, _) in zip(ids, turn.calls)
+                ]})
+                out.append({"role": "user", "content": [
+                    {"type": "tool_result", "tool_use_id": tool_use_id, "content": self.results.get(ref)}
+                    for tool_use_id, (_, _, ref) in zip(ids, turn.calls)
+                ]})
+            out.append({"role": "assistant", "content": turn.answer or "(no answer)"})
+        out.append({"role": "user", "content": message})
+        if session.summary:
+            first = out[0]
+            first["content"] = f"Summary of our earlier conversation:\n{session.summary}\n\n{first['content']}"
+        return out
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "results": len(self.results),
+            "token_budget": self.token_budget,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "trimmed_turns": self.trimmed,
+            "summarized_turns": self.summarized,
+        }
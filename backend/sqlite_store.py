@@ -0,0 +1,392 @@
+"""Durable SQLite (WAL) ticket storage with group-committed writes"""
+import asyncio
+import json
+import queue
+import sqlite3
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from store import StoreWriteError, TicketStore
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tickets (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    status TEXT NOT NULL COLLATE NOCASE,
+    priority TEXT NOT NULL COLLATE NOCASE,
+    category TEXT COLLATE NOCASE,
+    rev INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tickets_status ON tickets(status, seq);
+CREATE INDEX IF NOT EXISTS idx_tickets_priority ON tickets(priority, seq);
+CREATE INDEX IF NOT EXISTS idx_tickets_category ON tickets(category, seq);
+CREATE INDEX IF NOT EXISTS idx_tickets_rev ON tickets(rev);
+CREATE INDEX IF NOT EXISTS idx_tickets_created ON tickets(substr(json_extract(data, '$.created'), 1, 10));
+CREATE TABLE IF NOT EXISTS escalations (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    ticket_id TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_escalations_ticket ON escalations(ticket_id);
+CREATE TABLE IF NOT EXISTS kb_articles (
+    id TEXT PRIMARY KEY,
+    rev INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_kb_articles_rev ON kb_articles(rev);
+CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('rev', 0);
+"""
+
+INSERT_TICKET = ("INSERT INTO tickets (id, status, priority, category, rev, data) "
+                 "VALUES (:id, :status, :priority, :category, :rev, :data)")
+SEED_TICKET = INSERT_TICKET.replace("INSERT INTO", "INSERT OR IGNORE INTO")
+UPDATE_TICKET = ("UPDATE tickets SET data = json_patch(data, :patch), "
+                 "status = coalesce(:status, status), priority = coalesce(:priority, priority), "
+                 "category = coalesce(:category, category), rev = :rev WHERE id = :id")
+INSERT_ESCALATION = "INSERT INTO escalations (id, ticket_id, data) VALUES (:id, :ticket_id, :data)"
+UPDATE_ESCALATION = "UPDATE escalations SET data = json_patch(data, :patch) WHERE id = :id"
+# Escalations carry no revision; bumping their ticket's lets other workers see the change
+TOUCH_ESCALATED_TICKET = "UPDATE tickets SET rev = :rev WHERE id = (SELECT ticket_id FROM escalations WHERE id = :id)"
+PUT_KB_ARTICLE = "INSERT OR REPLACE INTO kb_articles (id, rev, data) VALUES (:id, :rev, :data)"
+ACQUIRE_LEASE = ("INSERT INTO leases (name, owner, expires) VALUES (:name, :owner, :expires) "
+                 "ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires = excluded.expires "
+                 "WHERE leases.owner = excluded.owner OR leases.expires < :now")
+
+FILTER_COLUMNS = ("status", "priority", "category")
+CREATED_EXPR = "substr(json_extract(data, '$.created'), 1, 10)"
+FETCH_SIZE = 256
+
+
+class _Write:
+    __slots__ = ("sql", "params", "future")
+
+    def __init__(self, sql: str, params: dict):
+        self.sql = sql
+        self.params = params
+        self.future: Future = Future()
+
+
+class _ScanConnection:
+    """A thread's reusable scan connection and whether a scan is still reading from it"""
+    __slots__ = ("conn", "busy")
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self.busy = False
+
+
+class SqliteTicketStore(TicketStore):
+    """SQLite-backed store safe to share between worker processes.
+
+    The database runs in WAL mode so readers never block the writer. Reads use
+    one connection per thread; every write goes through a single writer thread
+    that drains its queue into one ``BEGIN IMMEDIATE`` transaction per batch
+    (group commit), so a burst of POST /tickets pays for one fsync. Each write
+    stamps the row with a database-wide revision number, which ``changes_since``
+    uses to feed other workers' writes into this worker's search index and stats.
+
+    Every write has its own future, filed under the asyncio task that issued
+    it, so ``commit`` waits for (and reports failures of) the caller's writes
+    only, never another request's that happened to share the batch.
+    """
+
+    def __init__(self, path: str = "servicedesk.db", batch_size: int = 256,
+                 group_commit_ms: float = 5.0, busy_timeout_ms: int = 5000):
+        self.path = path
+        self.batch_size = batch_size
+        self.group_commit_window = group_commit_ms / 1000
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        self._pending: Dict[str, dict] = {}
+        self._pending_lock = threading.Lock()
+        self._task_writes: "weakref.WeakKeyDictionary[asyncio.Task, List[_Write]]" = weakref.WeakKeyDictionary()
+        # Writes issued outside any task (startup, scripts); the next commit waits for them
+        self._untracked: List[_Write] = []
+        self._queue: "queue.Queue[Optional[_Write]]" = queue.Queue()
+
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        self._writer = threading.Thread(target=self._write_loop, name="sqlite-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, cached_statements=64)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        return conn
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    # -- writes ---------------------------------------------------------------
+
+    def _enqueue(self, sql: str, params: dict, ticket: dict = None) -> Future:
+        write = _Write(sql, params)
+        if ticket is not None:
+            # Overlay for read-your-writes until the writer thread commits
+            with self._pending_lock:
+                self._pending[ticket["id"]] = {**ticket, "_future": write.future}
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        if task is None:
+            self._untracked.append(write)
+        else:
+            self._task_writes.setdefault(task, []).append(write)
+        self._queue.put(write)
+        return write.future
+
+    def _write_loop(self) -> None:
+        conn = self._connect()
+        while True:
+            first = self._queue.get()
+            if first is None:
+                break
+            batch = [first]
+            deadline = self.group_commit_window
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=deadline) if deadline > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+                deadline = 0
+            self._commit_batch(conn, batch)
+        conn.close()
+
+    def _commit_batch(self, conn: sqlite3.Connection, batch: List[_Write]) -> None:
+        errors: List[Optional[BaseException]] = [None] * len(batch)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            rev = conn.execute("SELECT value FROM meta WHERE key = 'rev'").fetchone()[0]
+            for i, write in enumerate(batch):
+                rev += 1
+                try:
+                    conn.execute(write.sql, {**write.params, "rev": rev})
+                except sqlite3.Error as e:
+                    # A failed statement is rolled back on its own; the batch continues
+                    errors[i] = e
+            conn.execute("UPDATE meta SET value = ? WHERE key = 'rev'", (rev,))
+            conn.execute("COMMIT")
+        except sqlite3.Error as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            errors = [e] * len(batch)
+        for write, error in zip(batch, errors):
+            if error is None:
+                write.future.set_result(None)
+            else:
+                write.future.set_exception(error)
+            ticket_id = write.params.get("id")
+            with self._pending_lock:
+                if ticket_id in self._pending and self._last_write_for(ticket_id) is write.future:
+                    del self._pending[ticket_id]
+
+    def _last_write_for(self, ticket_id: str) -> Optional[Future]:
+        entry = self._pending.get(ticket_id)
+        return entry.get("_future") if entry else None
+
+    @staticmethod
+    def _row_params(ticket: dict) -> dict:
+        return {
+            "id": ticket["id"],
+            "status": ticket["status"],
+            "priority": ticket["priority"],
+            "category": ticket.get("category"),
+            "data": json.dumps(ticket),
+        }
+
+    def seed(self, tickets: Iterable[dict]) -> None:
+        """Insert seed tickets (oldest first) unless another worker already has"""
+        writes = [_Write(SEED_TICKET, self._row_params(t)) for t in tickets]
+        for write in writes:
+            self._queue.put(write)
+        for write in writes:
+            write.future.result()
+
+    def add(self, ticket: dict) -> dict:
+        self._enqueue(INSERT_TICKET, self._row_params(ticket), ticket)
+        return ticket
+
+    def update(self, ticket_id: str, **changes) -> Optional[dict]:
+        ticket = self.get(ticket_id)
+        if ticket is None:
+            return None
+        ticket.update(changes)
+        params = {"id": ticket_id, "patch": json.dumps(changes)}
+        params.update({col: changes.get(col) for col in FILTER_COLUMNS})
+        self._enqueue(UPDATE_TICKET, params, ticket)
+        return ticket
+
+    def add_escalation(self, escalation: dict) -> dict:
+        self._enqueue(INSERT_ESCALATION, {
+            "id": escalation["id"],
+            "ticket_id": escalation["ticket_id"],
+            "data": json.dumps(escalation),
+        })
+        return escalation
+
+    def update_escalation(self, escalation_id: str, **changes) -> None:
+        # Queued behind the insert, so it applies even before that has committed
+        self._enqueue(UPDATE_ESCALATION, {"id": escalation_id, "patch": json.dumps(changes)})
+        self._enqueue(TOUCH_ESCALATED_TICKET, {"id": escalation_id})
+
+    def put_kb_articles(self, articles: Iterable[dict]) -> None:
+        for article in articles:
+            self._enqueue(PUT_KB_ARTICLE, {"id": article["id"], "data": json.dumps(article)})
+
+    async def commit(self) -> None:
+        writes = self._task_writes.pop(asyncio.current_task(), [])
+        if self._untracked:
+            writes, self._untracked = self._untracked + writes, []
+        failures = {}
+        for write in writes:
+            try:
+                if write.future.done():
+                    write.future.result()
+                else:
+                    await asyncio.wrap_future(write.future)
+            except sqlite3.Error as e:
+                failures[write.params.get("id")] = e
+        if failures:
+            raise StoreWriteError(failures)
+
+    def close(self) -> None:
+        self._queue.put(None)
+        self._writer.join()
+
+    # -- reads ----------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM tickets").fetchone()[0]
+
+    def __contains__(self, ticket_id: str) -> bool:
+        return self.get(ticket_id) is not None
+
+    def __iter__(self) -> Iterator[dict]:
+        """Newest first"""
+        return self.iter_where()
+
+    def get(self, ticket_id: str) -> Optional[dict]:
+        with self._pending_lock:
+            pending = self._pending.get(ticket_id)
+        if pending is not None:
+            return {k: v for k, v in pending.items() if k != "_future"}
+        row = self._conn.execute("SELECT data FROM tickets WHERE id = ?", (ticket_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    @staticmethod
+    def _where(filters: dict, created_from: str = None, created_to: str = None) -> Tuple[List[str], list]:
+        clauses = [f"{col} = ?" for col in FILTER_COLUMNS if filters.get(col)]
+        params = [filters[col] for col in FILTER_COLUMNS if filters.get(col)]
+        if created_from:
+            clauses.append(f"{CREATED_EXPR} >= ?")
+            params.append(created_from)
+        if created_to:
+            clauses.append(f"{CREATED_EXPR} <= ?")
+            params.append(created_to)
+        return clauses, params
+
+    def count(self, **filters) -> int:
+        clauses, params = self._where(filters)
+        where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+        return self._conn.execute(f"SELECT COUNT(*) FROM tickets{where}", params).fetchone()[0]
+
+    def _scan(self, sql: str, params: list) -> Iterator[Tuple[int, dict]]:
+        # Each thread reuses one scan connection. An unfinished scan (a streaming
+        # response, possibly resumed on another thread) pins its connection to a WAL
+        # snapshot, so a scan started meanwhile gets a temporary connection instead.
+        held = getattr(self._local, "scan", None)
+        if held is None:
+            held = self._local.scan = _ScanConnection(self._connect())
+        if held.busy:
+            held, conn = None, self._connect()
+        else:
+            held.busy, conn = True, held.conn
+        cursor = None
+        try:
+            cursor = conn.execute(sql, params)
+            while True:
+                rows = cursor.fetchmany(FETCH_SIZE)
+                if not rows:
+                    return
+                for seq, data in rows:
+                    yield seq, json.loads(data)
+        finally:
+            if held is None:
+                conn.close()
+            else:
+                if cursor is not None:
+                    cursor.close()
+                held.busy = False
+
+    def scan(self, status: str = None, priority: str = None, category: str = None,
+             created_from: str = None, created_to: str = None, before: int = None) -> Iterator[Tuple[int, dict]]:
+        clauses, params = self._where({"status": status, "priority": priority, "category": category},
+                                      created_from, created_to)
+        if before is not None:
+            clauses.append("seq < ?")
+            params.append(before)
+        where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+        return self._scan(f"SELECT seq, data FROM tickets{where} ORDER BY seq DESC", params)
+
+    def scan_escalations(self, status: str = None, created_from: str = None, created_to: str = None,
+                         after: int = None, ticket_id: str = None) -> Iterator[Tuple[int, dict]]:
+        clauses, params = [], []
+        if ticket_id:
+            clauses.append("ticket_id = ?")
+            params.append(ticket_id)
+        if status:
+            clauses.append("json_extract(data, '$.status') = ? COLLATE NOCASE")
+            params.append(status)
+        if created_from:
+            clauses.append(f"{CREATED_EXPR} >= ?")
+            params.append(created_from)
+        if created_to:
+            clauses.append(f"{CREATED_EXPR} <= ?")
+            params.append(created_to)
+        if after is not None:
+            clauses.append("seq > ?")
+            params.append(after)
+        where = (" WHERE " + " AND ".join(clauses)) if clauses else ""
+        return self._scan(f"SELECT seq, data FROM escalations{where} ORDER BY seq", params)
+
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        # One autocommit statement, outside the writer queue: the answer is needed now
+        now = time.time()
+        cursor = self._conn.execute(ACQUIRE_LEASE, {"name": name, "owner": owner, "now": now, "expires": now + ttl})
+        return cursor.rowcount > 0
+
+    def iter_kb_articles(self) -> Iterator[dict]:
+        return (article for _, article in self._scan("SELECT rev, data FROM kb_articles ORDER BY rev", []))
+
+    def revision(self) -> int:
+        return self._conn.execute("SELECT value FROM meta WHERE key = 'rev'").fetchone()[0]
+
+    def changes_since(self, rev: int) -> Tuple[List[dict], int]:
+        rows = self._conn.execute("SELECT rev, data FROM tickets WHERE rev > ? ORDER BY rev", (rev,)).fetchall()
+        if not rows:
+            return [], rev
+        return [json.loads(data) for _, data in rows], rows[-1][0]
+
+    def kb_changes_since(self, rev: int) -> Tuple[List[dict], int]:
+        rows = self._conn.execute("SELECT rev, data FROM kb_articles WHERE rev > ? ORDER BY rev", (rev,)).fetchall()
+        if not rows:
+            return [], rev
+        return [json.loads(data) for _, data in rows], rows[-1][0]
@@ -0,0 +1,105 @@
+"""Server-sent event encoding: token coalescing, heartbeats and optional gzip"""
+import asyncio
+import json
+import time
+import zlib
+from typing import AsyncIterator
+
+TOKEN_PREFIX = b'data: {"type": "token", "content": '
+EVENT_SUFFIX = b"}\n\n"
+HEARTBEAT = b": ping\n\n"
+_END = object()
+
+
+def encode_event(payload: dict) -> bytes:
+    if payload.get("type") == "token":
+        return TOKEN_PREFIX + json.dumps(payload["content"]).encode() + EVENT_SUFFIX
+    return f"data: {json.dumps(payload)}\n\n".encode()
+
+
+class SSEWriter:
+    """Turns a stream of event payloads into SSE bytes with few, larger writes.
+
+    Consecutive ``token`` events are merged into one event. A write goes out
+    at most once per ``flush_interval`` unless ``max_chunk_chars`` of text have
+    built up, but a token arriving after a quiet spell is sent at once, so
+    coalescing adds no time to first token. Any other event flushes pending
+    text first, keeping order. A comment line is sent after
+    ``heartbeat_interval`` seconds without output so idle proxies keep the
+    connection open through long tool phases. ``pacing`` is an optional pause
+    after each text write (for a typing effect); it is off by default. With
+    ``compress`` the output is one gzip stream, sync-flushed after every
+    write so each chunk can be decoded as soon as it arrives.
+    """
+
+    def __init__(self, flush_interval: float = 0.02, max_chunk_chars: int = 4096,
+                 heartbeat_interval: float = 15.0, pacing: float = 0.0):
+        self.flush_interval = flush_interval
+        self.max_chunk_chars = max_chunk_chars
+        self.heartbeat_interval = heartbeat_interval
+        self.pacing = pacing
+
+    async def _pump(self, events: AsyncIterator[dict], queue: asyncio.Queue) -> None:
+        try:
+            async for event in events:
+                await queue.put(event)
+            await queue.put(_END)
+        except Exception as e:
+            await queue.put(e)
+
+    async def stream(self, events: AsyncIterator[dict], compress: bool = False) -> AsyncIterator[bytes]:
+        gzip = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+        def out(data: bytes) -> bytes:
+            return gzip.compress(data) + gzip.flush(zlib.Z_SYNC_FLUSH) if gzip else data
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=256)
+        pump = asyncio.create_task(self._pump(events, queue))
+        pending, pending_chars = [], 0
+        last_write = float("-inf")
+        try:
+            while True:
+                now = time.monotonic()
+                if pending:
+                    timeout = max(0.0, last_write + self.flush_interval - now)
+                else:
+                    timeout = self.heartbeat_interval if self.heartbeat_interval > 0 else None
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    item = None
+
+                if item is None or (isinstance(item, dict) and item.get("type") == "token"):
+                    if item is not None:
+                        pending.append(item["content"])
+                        pending_chars += len(item["content"])
+                    now = time.monotonic()
+                    if pending and (pending_chars >= self.max_chunk_chars or now - last_write >= self.flush_interval):
+                        yield out(encode_event({"type": "token", "content": "".join(pending)}))
+                        pending, pending_chars, last_write = [], 0, time.monotonic()
+                        if self.pacing > 0:
+                            await asyncio.sleep(self.pacing)
+                    elif item is None and not pending:
+                        yield out(HEARTBEAT)
+                        last_write = now
+                    continue
+
+                if pending:
+                    chunk = encode_event({"type": "token", "content": "".join(pending)})
+                    pending, pending_chars = [], 0
+                else:
+                    chunk = b""
+                if item is _END:
+                    if chunk:
+                        yield out(chunk)
+                    if gzip:
+                        yield gzip.flush()
+                    return
+                if isinstance(item, Exception):
+                    if chunk:
+                        yield out(chunk)
+                    raise item
+                yield out(chunk + encode_event(item))
+                last_write = time.monotonic()
+        finally:
+            pump.cancel()
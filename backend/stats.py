@@ -0,0 +1,142 @@
+"""Incrementally maintained ticket statistics"""
+import bisect
+import threading
+from collections import Counter, deque
+from datetime import datetime, timezone
+from typing import Callable, Dict, Optional
+
+RESOLVED = "Resolved"
+RESOLUTION_WINDOW = 1000
+TREND_DAYS = 7
+
+
+def naive_utc(value: datetime) -> datetime:
+    """Timezone-aware datetimes converted to UTC without tzinfo, so they compare with naive ones"""
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def parse_timestamp(value) -> Optional[datetime]:
+    """Parse the ISO dates/datetimes used in ticket records, as naive datetimes"""
+    if isinstance(value, datetime):
+        return naive_utc(value)
+    if not value:
+        return None
+    try:
+        return naive_utc(datetime.fromisoformat(str(value)))
+    except ValueError:
+        return None
+
+
+class TicketStats:
+    """Running counters per status x priority plus rolling aggregates.
+
+    Counters are adjusted on every create and status change, resolution times
+    are kept in a fixed-size window (with a sorted mirror for percentiles) and
+    open-ticket deltas are bucketed per day for the week-over-week trend, so a
+    snapshot costs the same no matter how many tickets exist.
+    """
+
+    def __init__(self, window: int = RESOLUTION_WINDOW, clock: Callable[[], datetime] = datetime.now):
+        self.clock = clock
+        self.counts: Counter = Counter()
+        self.open_by_priority: Counter = Counter()
+        self.total_open = 0
+        self._window = deque(maxlen=window)
+        self._sorted = []
+        self._resolution_sum = 0.0
+        self._open_delta_by_day: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def _bump_open(self, priority: str, delta: int, when: Optional[datetime]) -> None:
+        self.total_open += delta
+        self.open_by_priority[priority] += delta
+        day = (when or self.clock()).toordinal()
+        self._open_delta_by_day[day] = self._open_delta_by_day.get(day, 0) + delta
+        if len(self._open_delta_by_day) > 4 * TREND_DAYS:
+            cutoff = self.clock().toordinal() - 2 * TREND_DAYS
+            for old in [d for d in self._open_delta_by_day if d < cutoff]:
+                del self._open_delta_by_day[old]
+
+    def _observe_resolution(self, hours: float) -> None:
+        if len(self._window) == self._window.maxlen:
+            evicted = self._window[0]
+            self._resolution_sum -= evicted
+            del self._sorted[bisect.bisect_left(self._sorted, evicted)]
+        self._window.append(hours)
+        self._resolution_sum += hours
+        bisect.insort(self._sorted, hours)
+
+    def on_create(self, ticket: dict) -> None:
+        status, priority = ticket["status"], ticket["priority"]
+        created = parse_timestamp(ticket.get("created_at") or ticket.get("created"))
+        with self._lock:
+            self.counts[(status, priority)] += 1
+            if status == RESOLVED:
+                # Historical tickets arrive already resolved; they never counted as open
+                resolved = parse_timestamp(ticket.get("resolved_at"))
+                if created and resolved and resolved >= created:
+                    self._observe_resolution((resolved - created).total_seconds() / 3600)
+            else:
+                self._bump_open(priority, 1, created)
+
+    def on_status_change(self, ticket: dict, old_status: str) -> None:
+        status, priority = ticket["status"], ticket["priority"]
+        if status == old_status:
+            return
+        now = self.clock()
+        with self._lock:
+            self.counts[(old_status, priority)] -= 1
+            self.counts[(status, priority)] += 1
+            if status == RESOLVED:
+                self._bump_open(priority, -1, now)
+                created = parse_timestamp(ticket.get("created_at") or ticket.get("created"))
+                resolved = parse_timestamp(ticket.get("resolved_at")) or now
+                if created and resolved >= created:
+                    self._observe_resolution((resolved - created).total_seconds() / 3600)
+            elif old_status == RESOLVED:
+                self._bump_open(priority, 1, now)
+
+    def _percentile(self, q: float) -> Optional[float]:
+        if not self._sorted:
+            return None
+        idx = min(len(self._sorted) - 1, int(round(q * (len(self._sorted) - 1))))
+        return round(self._sorted[idx], 1)
+
+    def _trend(self):
+        today = self.clock().toordinal()
+        opened_this_week = sum(self._open_delta_by_day.get(today - i, 0) for i in range(TREND_DAYS))
+        open_week_ago = self.total_open - opened_this_week
+        if open_week_ago <= 0:
+            return None, "n/a"
+        pct = round(100 * (self.total_open - open_week_ago) / open_week_ago, 1)
+        arrow = "↑" if pct > 0 else "↓" if pct < 0 else "→"
+        return pct, f"{arrow} {abs(pct):g}%"
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            samples = len(self._window)
+            mean = round(self._resolution_sum / samples, 1) if samples else None
+            trend_pct, trend = self._trend()
+            by_status: Dict[str, Dict[str, int]] = {}
+            for (status, priority), n in self.counts.items():
+                if n:
+                    by_status.setdefault(status, {})[priority] = n
+            return {
+                "total_open": self.total_open,
+                "p1_count": self.open_by_priority["P1"],
+                "p2_count": self.open_by_priority["P2"],
+                "p3_count": self.open_by_priority["P3"],
+                "by_status": by_status,
+                "avg_resolution_time": f"{mean:g} hours" if mean is not None else "n/a",
+                "resolution_hours": {
+                    "mean": mean,
+                    "p50": self._percentile(0.5),
+                    "p90": self._percentile(0.9),
+                    "p99": self._percentile(0.99),
+                    "samples": samples,
+                },
+                "trend": trend,
+                "trend_pct": trend_pct,
+            }
@@ -0,0 +1,269 @@
+"""Ticket storage: the backend interface and the indexed in-memory repository"""
+import bisect
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+INDEXED_FIELDS = ("status", "priority", "category")
+
+
+def _key(value) -> str:
+    return str(value).lower()
+
+
+class StoreWriteError(Exception):
+    """Buffered writes that failed; ``failures`` maps each record id to its error"""
+
+    def __init__(self, failures: Dict[str, BaseException]):
+        self.failures = failures
+        details = "; ".join(f"{record_id}: {error}" for record_id, error in list(failures.items())[:3])
+        super().__init__(f"{len(failures)} write(s) failed ({details})")
+
+
+def in_created_range(record: dict, created_from: str = None, created_to: str = None) -> bool:
+    """Inclusive date-range check on a record's ``created`` date or timestamp"""
+    created = str(record.get("created") or "")[:10]
+    if created_from and created < created_from:
+        return False
+    if created_to and created > created_to:
+        return False
+    return True
+
+
+class TicketStore:
+    """Storage backend interface for tickets, escalations and imported KB articles.
+
+    Write methods may be buffered; ``await commit()`` returns once every write
+    the calling task issued is durable, and raises ``StoreWriteError`` if any
+    of them failed. ``changes_since`` lets a worker pick up writes made by
+    other processes sharing the same backend.
+    """
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def __iter__(self) -> Iterator[dict]:
+        raise NotImplementedError
+
+    def add(self, ticket: dict) -> dict:
+        raise NotImplementedError
+
+    def add_many(self, tickets: Iterable[dict]) -> List[dict]:
+        """Add a batch of tickets; buffered backends commit them together"""
+        return [self.add(ticket) for ticket in tickets]
+
+    def get(self, ticket_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def update(self, ticket_id: str, **changes) -> Optional[dict]:
+        raise NotImplementedError
+
+    def count(self, **filters) -> int:
+        raise NotImplementedError
+
+    def scan(self, status: str = None, priority: str = None, category: str = None,
+             created_from: str = None, created_to: str = None, before: int = None) -> Iterator[Tuple[int, dict]]:
+        """Newest-first ``(seq, ticket)`` pairs matching every filter, with ``seq < before``.
+
+        ``seq`` is a stable creation-order key, usable as a keyset cursor.
+        Created bounds are inclusive ``YYYY-MM-DD`` dates.
+        """
+        raise NotImplementedError
+
+    def iter_where(self, status: str = None, priority: str = None, category: str = None) -> Iterator[dict]:
+        """Newest-first tickets matching every given filter"""
+        return (ticket for _, ticket in self.scan(status=status, priority=priority, category=category))
+
+    def add_escalation(self, escalation: dict) -> dict:
+        raise NotImplementedError
+
+    def update_escalation(self, escalation_id: str, **changes) -> None:
+        raise NotImplementedError
+
+    def scan_escalations(self, status: str = None, created_from: str = None, created_to: str = None,
+                         after: int = None, ticket_id: str = None) -> Iterator[Tuple[int, dict]]:
+        """Oldest-first ``(seq, escalation)`` pairs matching every filter, with ``seq > after``"""
+        raise NotImplementedError
+
+    def iter_escalations(self) -> Iterator[dict]:
+        """Oldest first"""
+        return (escalation for _, escalation in self.scan_escalations())
+
+    def put_kb_articles(self, articles: Iterable[dict]) -> None:
+        """Store knowledge base articles, replacing any with the same id"""
+        raise NotImplementedError
+
+    def iter_kb_articles(self) -> Iterator[dict]:
+        raise NotImplementedError
+
+    async def commit(self) -> None:
+        """Wait until the calling task's buffered writes are durable; raises ``StoreWriteError`` on failures"""
+
+    def revision(self) -> int:
+        """Current write high-water mark for ``changes_since``"""
+        return 0
+
+    def changes_since(self, rev: int) -> Tuple[List[dict], int]:
+        """Tickets written after ``rev`` and the new high-water mark"""
+        return [], rev
+
+    def kb_changes_since(self, rev: int) -> Tuple[List[dict], int]:
+        """Knowledge base articles written after ``rev`` and the new high-water mark"""
+        return [], rev
+
+    def acquire_lease(self, name: str, owner: str, ttl: float) -> bool:
+        """Take or renew the lease ``name`` for ``ttl`` seconds; False while another owner holds it.
+
+        Per-process backends have a single owner, which always holds it.
+        """
+        return True
+
+    def close(self) -> None:
+        pass
+
+
+class TicketRepository(TicketStore):
+    """Tickets with a primary index by ID and secondary indexes on status, priority and category.
+
+    Rows live in an append-only list in creation order, so inserts are O(1)
+    amortized and newest-first iteration walks the list backwards; a row's
+    position doubles as its keyset cursor. Each secondary bucket is a sorted
+    list of row positions. New tickets append to it; when a ticket changes
+    status its old bucket entry goes stale and is skipped on read rather than
+    removed, which keeps writes cheap and lets tool threads iterate while the
+    event loop inserts.
+    """
+
+    def __init__(self, tickets: Iterable[dict] = ()):
+        self._rows: List[dict] = []
+        self._by_id: Dict[str, int] = {}
+        self._buckets: Dict[str, Dict[str, Tuple[List[int], Set[int]]]] = {f: {} for f in INDEXED_FIELDS}
+        self._counts: Dict[str, Dict[str, int]] = {f: {} for f in INDEXED_FIELDS}
+        self._escalations: List[dict] = []
+        self._escalation_pos: Dict[str, int] = {}
+        self._kb_articles: Dict[str, dict] = {}
+        for ticket in tickets:
+            self.add(ticket)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, ticket_id: str) -> bool:
+        return ticket_id in self._by_id
+
+    def __iter__(self) -> Iterator[dict]:
+        """Newest first"""
+        rows = self._rows
+        for pos in range(len(rows) - 1, -1, -1):
+            yield rows[pos]
+
+    def _index(self, field: str, value, pos: int) -> None:
+        key = _key(value)
+        positions, members = self._buckets[field].setdefault(key, ([], set()))
+        if pos not in members:
+            members.add(pos)
+            if positions and pos < positions[-1]:
+                bisect.insort(positions, pos)
+            else:
+                positions.append(pos)
+        counts = self._counts[field]
+        counts[key] = counts.get(key, 0) + 1
+
+    def add(self, ticket: dict) -> dict:
+        if ticket["id"] in self._by_id:
+            raise ValueError(f"Duplicate ticket id: {ticket['id']}")
+        pos = len(self._rows)
+        self._rows.append(ticket)
+        self._by_id[ticket["id"]] = pos
+        for field in INDEXED_FIELDS:
+            self._index(field, ticket.get(field), pos)
+        return ticket
+
+    def get(self, ticket_id: str) -> Optional[dict]:
+        pos = self._by_id.get(ticket_id)
+        return None if pos is None else self._rows[pos]
+
+    def update(self, ticket_id: str, **changes) -> Optional[dict]:
+        """Apply field changes in place and move the ticket between secondary buckets"""
+        pos = self._by_id.get(ticket_id)
+        if pos is None:
+            return None
+        ticket = self._rows[pos]
+        for field in INDEXED_FIELDS:
+            if field in changes and _key(changes[field]) != _key(ticket.get(field)):
+                self._counts[field][_key(ticket.get(field))] -= 1
+                self._index(field, changes[field], pos)
+        ticket.update(changes)
+        return ticket
+
+    def count(self, **filters) -> int:
+        """Number of tickets matching a single indexed field, e.g. count(status="Open")"""
+        if not filters:
+            return len(self._rows)
+        if len(filters) > 1:
+            return sum(1 for _ in self.iter_where(**filters))
+        (field, value), = filters.items()
+        return self._counts[field].get(_key(value), 0)
+
+    def scan(self, status: str = None, priority: str = None, category: str = None,
+             created_from: str = None, created_to: str = None, before: int = None) -> Iterator[Tuple[int, dict]]:
+        """Newest-first matches, driven by the smallest bucket and seeked with bisect"""
+        filters = {f: _key(v) for f, v in (("status", status), ("priority", priority), ("category", category)) if v}
+        rows = self._rows
+        positions = None
+        if filters:
+            field, value = min(filters.items(), key=lambda fv: self._counts[fv[0]].get(fv[1], 0))
+            bucket = self._buckets[field].get(value)
+            positions = bucket[0] if bucket else []
+            end = len(positions) if before is None else bisect.bisect_left(positions, before)
+        else:
+            end = len(rows) if before is None else min(len(rows), max(before, 0))
+        for i in range(end - 1, -1, -1):
+            pos = i if positions is None else positions[i]
+            ticket = rows[pos]
+            if any(_key(ticket.get(f)) != v for f, v in filters.items()):
+                continue
+            if not in_created_range(ticket, created_from, created_to):
+                continue
+            yield pos, ticket
+
+    def add_escalation(self, escalation: dict) -> dict:
+        self._escalation_pos[escalation["id"]] = len(self._escalations)
+        self._escalations.append(escalation)
+        return escalation
+
+    def update_escalation(self, escalation_id: str, **changes) -> None:
+        pos = self._escalation_pos.get(escalation_id)
+        if pos is not None:
+            self._escalations[pos].update(changes)
+
+    def scan_escalations(self, status: str = None, created_from: str = None, created_to: str = None,
+                         after: int = None, ticket_id: str = None) -> Iterator[Tuple[int, dict]]:
+        escalations = self._escalations
+        start = 0 if after is None else max(after + 1, 0)
+        for seq in range(start, len(escalations)):
+            escalation = escalations[seq]
+            if status and _key(escalation.get("status")) != _key(status):
+                continue
+            if ticket_id and escalation.get("ticket_id") != ticket_id:
+                continue
+            if not in_created_range(escalation, created_from, created_to):
+                continue
+            yield seq, escalation
+
+    def put_kb_articles(self, articles: Iterable[dict]) -> None:
+        for article in articles:
+            self._kb_articles[article["id"]] = article
+
+    def iter_kb_articles(self) -> Iterator[dict]:
+        return iter(list(self._kb_articles.values()))
+
+
+def open_store(backend: str, seed: Iterable[dict] = (), **options) -> TicketStore:
+    """Create the configured storage backend, seeding it if it is empty"""
+    if backend == "memory":
+        return TicketRepository(seed)
+    if backend == "sqlite":
+        from sqlite_store import SqliteTicketStore
+        store = SqliteTicketStore(**options)
+        store.seed(seed)
+        return store
+    raise ValueError(f"Unknown storage backend: {backend}")
@@ -0,0 +1,231 @@
+"""Offline hashed TF-IDF embeddings with NumPy cosine-similarity search"""
+import json
+import math
+import os
+import uuid
+import zlib
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from search import tokenize
+
+DEFAULT_DIM = 512
+CHAR_NGRAM = 3
+CHAR_NGRAM_WEIGHT = 0.3
+BIGRAM_WEIGHT = 0.5
+
+
+def features(text: str) -> Dict[str, float]:
+    """Weighted features: stemmed words, adjacent word pairs and character trigrams"""
+    tokens = tokenize(text)
+    feats: Dict[str, float] = {}
+    for tok in tokens:
+        feats["w:" + tok] = feats.get("w:" + tok, 0.0) + 1.0
+        padded = f"#{tok}#"
+        for i in range(len(padded) - CHAR_NGRAM + 1):
+            gram = "c:" + padded[i:i + CHAR_NGRAM]
+            feats[gram] = feats.get(gram, 0.0) + CHAR_NGRAM_WEIGHT
+    for a, b in zip(tokens, tokens[1:]):
+        key = f"b:{a} {b}"
+        feats[key] = feats.get(key, 0.0) + BIGRAM_WEIGHT
+    return feats
+
+
+def _bucket(feature: str, dim: int) -> Tuple[int, float]:
+    # crc32 rather than hash(): stable across processes, so saved matrices stay valid
+    h = zlib.crc32(feature.encode())
+    return h % dim, (1.0 if (h >> 16) & 1 else -1.0)
+
+
+class VectorIndex:
+    """Contiguous float32 matrix of L2-normalized hashed TF-IDF vectors.
+
+    Rows live in two segments: a read-only ``base`` (possibly a memory-mapped
+    ``.npy`` shared by every worker) and an in-memory ``delta`` that grows by
+    doubling for incremental adds. Replacing a base row tombstones it and
+    appends the new vector to the delta. IDF weights are fixed by ``fit``;
+    documents added later reuse them until the next rebuild.
+    """
+
+    def __init__(self, dim: int = DEFAULT_DIM):
+        self.dim = dim
+        self.idf = np.ones(dim, dtype=np.float32)
+        self.base = np.zeros((0, dim), dtype=np.float32)
+        self.base_ids: List[str] = []
+        self.base_alive = np.zeros(0, dtype=bool)
+        self._delta = np.zeros((16, dim), dtype=np.float32)
+        self._delta_n = 0
+        self.delta_ids: List[str] = []
+        self._rows: Dict[str, Tuple[str, int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._rows
+
+    # -- embedding ------------------------------------------------------------
+
+    def _raw(self, text: str) -> np.ndarray:
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for feature, weight in features(text).items():
+            idx, sign = _bucket(feature, self.dim)
+            vec[idx] += sign * (1.0 + math.log(weight)) if weight >= 1 else sign * weight
+        return vec
+
+    def embed_many(self, texts: Sequence[str]) -> np.ndarray:
+        """(len(texts), dim) matrix of unit vectors; all-zero rows for empty texts"""
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            out[i] = self._raw(text)
+        out *= self.idf
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        np.divide(out, norms, out=out, where=norms > 0)
+        return out
+
+    def fit(self, docs: Iterable[Tuple[str, str]]) -> "VectorIndex":
+        """Compute IDF over ``(id, text)`` pairs and rebuild the matrix from them"""
+        docs = list(docs)
+        df = np.zeros(self.dim, dtype=np.float32)
+        for _, text in docs:
+            buckets = {_bucket(f, self.dim)[0] for f in features(text)}
+            df[list(buckets)] += 1
+        n = len(docs)
+        self.idf = (np.log((1 + n) / (1 + df)) + 1).astype(np.float32)
+        self.base = self.embed_many([text for _, text in docs]) if docs else np.zeros((0, self.dim), np.float32)
+        self.base_ids = [doc_id for doc_id, _ in docs]
+        self.base_alive = np.ones(n, dtype=bool)
+        self._delta = np.zeros((16, self.dim), dtype=np.float32)
+        self._delta_n = 0
+        self.delta_ids = []
+        self._rows = {doc_id: ("base", i) for i, doc_id in enumerate(self.base_ids)}
+        return self
+
+    # -- incremental updates --------------------------------------------------
+
+    def add(self, doc_id: str, text: str) -> None:
+        self.add_many([(doc_id, text)])
+
+    def add_many(self, docs: Sequence[Tuple[str, str]]) -> None:
+        """Embed a batch in one pass and append (or overwrite) its rows"""
+        if not docs:
+            return
+        vectors = self.embed_many([text for _, text in docs])
+        for (doc_id, _), vec in zip(docs, vectors):
+            segment, row = self._rows.get(doc_id, (None, None))
+            if segment == "delta":
+                self._delta[row] = vec
+                continue
+            if segment == "base":
+                self.base_alive[row] = False
+            if self._delta_n == len(self._delta):
+                grown = np.zeros((2 * len(self._delta), self.dim), dtype=np.float32)
+                grown[:self._delta_n] = self._delta[:self._delta_n]
+                self._delta = grown
+            self._delta[self._delta_n] = vec
+            self.delta_ids.append(doc_id)
+            self._rows[doc_id] = ("delta", self._delta_n)
+            self._delta_n += 1
+
+    def remove(self, doc_id: str) -> None:
+        segment, row = self._rows.pop(doc_id, (None, None))
+        if segment == "base":
+            self.base_alive[row] = False
+        elif segment == "delta":
+            self._delta[row] = 0.0
+
+    # -- search ---------------------------------------------------------------
+
+    def search_many(self, texts: Sequence[str], k: int = 5, min_score: float = 0.0,
+                    predicate: Optional[Callable[[str], bool]] = None,
+                    oversample: int = 4) -> List[List[Tuple[str, float]]]:
+        """Cosine top-k ``(id, score)`` lists for a batch of queries, one matrix product per segment"""
+        # Read the count before the array: a concurrent add may swap in a larger array
+        delta_n = self._delta_n
+        delta, delta_ids = self._delta[:delta_n], self.delta_ids
+        queries = self.embed_many(texts)
+        want = k * oversample if predicate else k
+        results = []
+        base_scores = queries @ self.base.T if len(self.base) else np.zeros((len(texts), 0), np.float32)
+        if len(self.base):
+            base_scores[:, ~self.base_alive] = -1.0
+        delta_scores = queries @ delta.T
+        scores = np.concatenate([base_scores, delta_scores], axis=1)
+        n_base = base_scores.shape[1]
+        for row in scores:
+            if not row.size:
+                results.append([])
+                continue
+            top = min(want, row.size)
+            candidates = np.argpartition(-row, top - 1)[:top]
+            candidates = candidates[np.argsort(-row[candidates])]
+            hits = []
+            for col in candidates:
+                score = float(row[col])
+                if score < min_score or score <= 0:
+                    break
+                doc_id = self.base_ids[col] if col < n_base else delta_ids[col - n_base]
+                if predicate and not predicate(doc_id):
+                    continue
+                hits.append((doc_id, round(score, 4)))
+                if len(hits) == k:
+                    break
+            results.append(hits)
+        return results
+
+    def search(self, text: str, k: int = 5, min_score: float = 0.0,
+               predicate: Optional[Callable[[str], bool]] = None) -> List[Tuple[str, float]]:
+        return self.search_many([text], k=k, min_score=min_score, predicate=predicate)[0]
+
+    # -- persistence ----------------------------------------------------------
+
+    def save(self, path: str) -> None:
+        """Write live rows as one contiguous matrix plus ``<path>.json`` metadata naming it.
+
+        Every save writes a new ``<path>.<version>.npy`` and then renames the
+        metadata into place, so a worker loading concurrently always pairs the
+        ids with their own matrix. The matrix it replaces is deleted; workers
+        that already mapped it keep their mapping.
+        """
+        ids = [doc_id for doc_id, alive in zip(self.base_ids, self.base_alive) if alive] + self.delta_ids
+        matrix = np.concatenate([self.base[self.base_alive], self._delta[:self._delta_n]], axis=0)
+        previous = None
+        try:
+            with open(path + ".json") as f:
+                previous = json.load(f).get("matrix")
+        except (OSError, ValueError):
+            pass
+        name = f"{os.path.basename(path)}.{uuid.uuid4().hex[:12]}.npy"
+        with open(os.path.join(os.path.dirname(path), name), "wb") as f:
+            np.save(f, np.ascontiguousarray(matrix, dtype=np.float32))
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"dim": self.dim, "rows": len(ids), "matrix": name, "ids": ids, "idf": self.idf.tolist()}, f)
+        os.replace(tmp, path + ".json")
+        if previous and previous != name:
+            try:
+                os.remove(os.path.join(os.path.dirname(path), previous))
+            except OSError:
+                pass
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "VectorIndex":
+        """Load a saved index; with ``mmap`` the base matrix is a read-only shared mapping.
+
+        Raises ``ValueError`` if the matrix, ids and IDF weights don't agree.
+        """
+        with open(path + ".json") as f:
+            meta = json.load(f)
+        dim, ids = meta["dim"], meta["ids"]
+        base = np.load(os.path.join(os.path.dirname(path), meta["matrix"]), mmap_mode="r" if mmap else None)
+        if base.shape != (len(ids), dim) or meta.get("rows") != len(ids) or len(meta["idf"]) != dim:
+            raise ValueError(f"Vector index {path} is inconsistent: matrix {base.shape}, "
+                             f"{len(ids)} ids, {len(meta['idf'])} IDF weights, dim {dim}")
+        index = cls(dim=dim)
+        index.idf = np.asarray(meta["idf"], dtype=np.float32)
+        index.base = base
+        index.base_ids = ids
+        index.base_alive = np.ones(len(index.base_ids), dtype=bool)
+        index._rows = {doc_id: ("base", i) for i, doc_id in enumerate(index.base_ids)}
+        return index
@@ -362,6 +362,8 @@ function Message({ message, onEscalate, onShowTicketForm }) {
   )
 }
 
+const newSessionId = () => `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 10)}`
+
 export default function App() {
   const [activeTab, setActiveTab] = useState('user') // 'user' or 'admin'
   const [messages, setMessages] = useState([])
@@ -369,9 +371,11 @@ export default function App() {
   const [loading, setLoading] = useState(false)
   const [showTicketForm, setShowTicketForm] = useState(false)
   const messagesEnd = useRef(null)
+  const sessionId = useRef(newSessionId())
 
-  // Reset messages when tab changes
+  // Reset messages (and start a new conversation) when tab changes
   useEffect(() => {
+    sessionId.current = newSessionId()
     setMessages([])
     setShowTicketForm(false)
   }, [activeTab])
@@ -394,22 +398,45 @@ export default function App() {
     const assistantMessage = { id: assistantId, role: 'assistant', content: '', tools: [], contexts: [], streaming: true, timestamp: Date.now() }
     setMessages(prev => [...prev, assistantMessage])
 
+    const fail = (content) => setMessages(prev => {
+      const newMsgs = [...prev]
+      const lastIdx = newMsgs.findIndex(m => m.id === assistantId)
+      if (lastIdx !== -1) {
+        newMsgs[lastIdx] = { ...newMsgs[lastIdx], content, streaming: false }
+      }
+      return newMsgs
+    })
+
     try {
       const response = await fetch(`${API_URL}/chat`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ message: msg, role: activeTab })
+        body: JSON.stringify({ message: msg, role: activeTab, session_id: sessionId.current })
       })
 
+      // Rejections (e.g. 429 when the assistant is busy) come back as JSON, not a stream
+      if (!response.ok) {
+        const body = await response.json().catch(() => ({}))
+        const retryAfter = response.headers.get('Retry-After')
+        const detail = typeof body.detail === 'string' ? body.detail : `Request failed (${response.status}).`
+        fail(retryAfter ? `${detail} Try again in ${retryAfter} seconds.` : detail)
+        setLoading(false)
+        return
+      }
+
       const reader = response.body.getReader()
       const decoder = new TextDecoder()
+      let buffer = ''
 
       while (true) {
         const { done, value } = await reader.read()
         if (done) break
 
-        const chunk = decoder.decode(value)
-        const lines = chunk.split('\n').filter(l => l.startsWith('data: '))
+        // Events can straddle reads; keep the trailing partial line for the next one
+        buffer += decoder.decode(value, { stream: true })
+        const parts = buffer.split('\n')
+        buffer = parts.pop()
+        const lines = parts.filter(l => l.startsWith('data: '))
 
         for (const line of lines) {
           try {
@@ -447,18 +474,7 @@ export default function App() {
         }
       }
     } catch (error) {
-      setMessages(prev => {
-        const newMsgs = [...prev]
-        const lastIdx = newMsgs.findIndex(m => m.id === assistantId)
-        if (lastIdx !== -1) {
-          newMsgs[lastIdx] = {
-            ...newMsgs[lastIdx],
-            content: 'Unable to connect. Please check your connection and try again.',
-            streaming: false
-          }
-        }
-        return newMsgs
-      })
+      fail('Unable to connect. Please check your connection and try again.')
     }
 
     setLoading(false)